@@ -0,0 +1,161 @@
+'''
+End-to-end benchmark of the Linny-R connector against the fake Linny-R console (software/fake_lrc.py).
+
+Reports the time per phase of a run (preparing the experiment, writing the
+scenario file, solving and reading the output), the peak memory of the Python
+side, and the throughput for a number of worker processes and concurrent runs.
+Runs on Linux without lrc.exe, e.g.:
+
+    python benchmark_connector.py --horizons 1 10 --experiments 5 --workers 1 2 4
+
+'''
+
+# import required packages
+import argparse, atexit, os, shutil, statistics, tempfile, time, tracemalloc
+
+from ema_workbench import (RealParameter, TimeSeriesOutcome, MultiprocessingEvaluator,
+                           SequentialEvaluator)
+
+from linnyr_connector import LinnyRModel_Botlek #@UnresolvedImport
+from linnyr_model import patch_model #@UnresolvedImport
+from linnyr_runner import AsyncLinnyRRunner #@UnresolvedImport
+
+# define the path of the fake Linny-R console
+FAKE_LRC = os.path.join(os.path.abspath('./software'), 'fake_lrc.py')
+
+
+# define a sink that keeps the telemetry of the runs in memory
+class MemorySink:
+
+    # create an instance of this class
+    def __init__(self):
+        self.records = []
+
+    # define a function for storing the telemetry of a run
+    def record(self, telemetry):
+        self.records.append(telemetry)
+
+
+# define a function for creating a copy of the model whose run period is the whole time horizon (lrc solves start-period to end-period)
+def create_model_directory(time_steps):
+    directory = tempfile.mkdtemp(prefix=f'benchmark_{time_steps}_')
+    atexit.register(shutil.rmtree, directory, True)
+    patch_model('./model/botlek_model.lnr', os.path.join(directory, 'botlek_model.lnr'), {},
+                {'start-period':1, 'end-period':time_steps})
+    return directory
+
+
+# define a function for creating the Botlek model with the fake Linny-R console
+def create_model(time_horizon):
+    model = LinnyRModel_Botlek(name='BotlekModel', wd=create_model_directory(35040 * time_horizon),
+                               model_file='botlek_model.lnr', time_horizon=time_horizon)
+    model.linnyr = FAKE_LRC
+
+    # define the uncertain factors (a time series factor, a linear trajectory and a constant)
+    model.uncertainties = [RealParameter(name='Electricity price in 2030', variable_name='E day-ahead:Price',
+                                         lower_bound=5.0, upper_bound=20.0),
+                           RealParameter(name='Gas price in 2030', variable_name='natural gas market:Price',
+                                         lower_bound=5.0, upper_bound=20.0),
+                           RealParameter(name='Factor upward balancing electricity price', variable_name='Unbal opregelen:Price',
+                                         lower_bound=0.7, upper_bound=1.3),
+                           RealParameter(name='Factor electricity demand imbalance market', variable_name='Unbal opregelen:UB',
+                                         lower_bound=0.7, upper_bound=1.3),
+                           RealParameter(name='E-boiler CAPEX', variable_name='Capex E-boiler:Price',
+                                         lower_bound=5.0, upper_bound=20.0)]
+
+    # define the outcomes
+    model.outcomes = [TimeSeriesOutcome(name='CF total', variable_name='CF total'),
+                      TimeSeriesOutcome(name='CO2 emissions', variable_name='CO2 emission')]
+    return model
+
+
+# define a function for creating experiments (variable name -> value) from the uncertainties of a model
+def create_experiments(model, n):
+    return [{u.variable_name[0]:u.lower_bound + (u.upper_bound - u.lower_bound) * (i + 0.5) / n
+             for u in model.uncertainties} for i in range(n)]
+
+
+# define a function for measuring the time per phase and the peak memory of sequential runs
+def benchmark_phases(time_horizon, n_experiments):
+    model = create_model(time_horizon)
+    model.telemetry = MemorySink()
+    experiments = create_experiments(model, n_experiments)
+
+    # the first run converts the electricity data (only once per version of the data)
+    model.run_experiment(experiments[0])
+    model.telemetry.records.clear()
+
+    tracemalloc.start()
+    prepare = []
+    start = time.perf_counter()
+    for experiment in experiments:
+        started = time.perf_counter()
+        model.prepare_experiment(experiment)
+        prepare.append(time.perf_counter() - started)
+        model.run_experiment(experiment)
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # report the median of each phase
+    records = model.telemetry.records
+    phases = {'prepare':statistics.median(prepare)}
+    phases.update({i:statistics.median(r[i] for r in records) for i in ('write_input', 'solver', 'read_output')})
+    print(f'{model.time_steps:>7} periods: ' + ', '.join(f'{k} {v:6.3f} s' for k, v in phases.items())
+          + f', total {total / n_experiments:6.3f} s per run, peak Python memory {peak / 2 ** 20:7.1f} MB')
+
+
+# define a function for measuring the throughput for a number of worker processes
+def benchmark_workers(time_horizon, n_experiments, workers):
+    model = create_model(time_horizon)
+    model.prepare_experiment(create_experiments(model, 1)[0])
+
+    for n_processes in workers:
+        start = time.perf_counter()
+        if n_processes == 1:
+            with SequentialEvaluator(model) as evaluator:
+                evaluator.perform_experiments(scenarios=n_experiments)
+        else:
+            with MultiprocessingEvaluator(model, n_processes=n_processes) as evaluator:
+                evaluator.perform_experiments(scenarios=n_experiments)
+        total = time.perf_counter() - start
+        print(f'{model.time_steps:>7} periods, {n_processes:>2} worker(s): {total:7.2f} s, '
+              f'{n_experiments / total:6.2f} runs/s')
+
+
+# define a function for measuring the throughput of the asyncio runner for a number of concurrent runs
+def benchmark_concurrency(time_horizon, n_experiments, concurrency):
+    model = create_model(time_horizon)
+    experiments = create_experiments(model, n_experiments)
+    model.prepare_experiment(experiments[0])
+
+    for max_concurrency in concurrency:
+        start = time.perf_counter()
+        AsyncLinnyRRunner(model, max_concurrency=max_concurrency).run_experiments(experiments)
+        total = time.perf_counter() - start
+        print(f'{model.time_steps:>7} periods, {max_concurrency:>2} concurrent run(s): {total:7.2f} s, '
+              f'{n_experiments / total:6.2f} runs/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--horizons', type=int, nargs='+', default=[1, 10], help='time horizons in years')
+    parser.add_argument('--experiments', type=int, default=5, help='number of experiments per measurement')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='numbers of worker processes')
+    parser.add_argument('--solve-time', type=float, default=1.0, help='seconds the fake solver sleeps per run')
+    args = parser.parse_args()
+
+    # configure the fake Linny-R console (the worker processes inherit the environment)
+    os.environ['LRC_FAKE_SOLVE_TIME'] = str(args.solve_time)
+
+    print('time per phase (median):')
+    for time_horizon in args.horizons:
+        benchmark_phases(time_horizon, args.experiments)
+
+    print('scaling over worker processes (ema_workbench evaluators):')
+    for time_horizon in args.horizons:
+        benchmark_workers(time_horizon, args.experiments * max(args.workers), args.workers)
+
+    print('scaling over concurrent runs (AsyncLinnyRRunner):')
+    for time_horizon in args.horizons:
+        benchmark_concurrency(time_horizon, args.experiments * max(args.workers), args.workers)
@@ -0,0 +1,76 @@
+'''
+Benchmark of the columnar scenario file writer against the csv.writer + zip_longest writer.
+
+'''
+
+# import required packages
+import csv, os, tempfile, time
+from itertools import zip_longest
+
+import numpy as np
+
+from linnyr_io import write_scenario_file #@UnresolvedImport
+
+
+# define the writer that was used by BaseLinnyRModel before the columnar writer
+def write_scenario_file_csv(path, experiment):
+    with open(path, 'w', newline = '') as fh:
+        w = csv.writer(fh, delimiter = ';')
+        w.writerow(experiment.keys())
+        values = [list(i) if isinstance(i, np.ndarray) else [i] for i in experiment.values()]
+        w.writerows(zip_longest(*values, fillvalue = ''))
+
+
+# define a function for creating an experiment that looks like a Botlek experiment
+def create_experiment(time_horizon):
+    electricity_data = np.loadtxt(os.path.join('data', 'electricity_data.csv'), delimiter=',', skiprows=1)
+    rng = np.random.default_rng(42)
+    n_rows = 35040 * time_horizon + 1
+
+    # 4 scaled reference series, 5 linear price trajectories and 11 scalar levers and constants
+    experiment = {f'reference {i}:Price':np.tile(electricity_data[:, i], time_horizon) * rng.uniform(0.7, 1.3)
+                  for i in range(4)}
+    experiment.update({f'trajectory {i}:Price':np.linspace(rng.uniform(0, 60), rng.uniform(5, 20), n_rows)
+                       for i in range(5)})
+    experiment.update({f'scalar {i}:UB':float(rng.integers(0, 3200)) for i in range(11)})
+    return experiment
+
+
+# define a function for reading a scenario file back into a dict of columns (for comparing the writers)
+def read_columns(path):
+    with open(path, newline='') as fh:
+        columns = zip(*csv.reader(fh, delimiter=';'))
+        return {column[0]:[float(i) if i else None for i in column[1:]] for column in columns}
+
+
+# define a function for timing a writer (best of a number of repeats)
+def time_writer(writer, path, experiment, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        writer(path, experiment)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+
+    # define the writers to compare
+    writers = {'csv.writer':write_scenario_file_csv,
+               'columnar':write_scenario_file,
+               'columnar (6 decimals)':lambda path, experiment: write_scenario_file(path, experiment, decimals=6)}
+
+    # run the benchmark for one and ten years of quarters
+    with tempfile.TemporaryDirectory() as directory:
+        for time_horizon in (1, 10):
+            experiment = create_experiment(time_horizon)
+            print(f'time horizon of {time_horizon} year(s):')
+
+            for name, writer in writers.items():
+                path = os.path.join(directory, f'{name}.csv')
+                timing = time_writer(writer, path, experiment, repeats=3)
+                print(f'  {name:<22} {timing:7.3f} s')
+
+            # check that the exact writers produce the same scenario data
+            identical = read_columns(os.path.join(directory, 'csv.writer.csv')) == read_columns(os.path.join(directory, 'columnar.csv'))
+            print(f'  identical scenario data: {identical}')
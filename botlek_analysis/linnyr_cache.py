@@ -0,0 +1,130 @@
+'''
+On-disk cache of Linny-R results, so identical experiments are not solved twice.
+
+'''
+
+# import required packages
+import hashlib, os, tempfile
+
+import numpy as np
+
+
+# define a function for hashing the content of a file
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# define a function for hashing an experiment dict (scalars, lists and arrays)
+def hash_experiment(experiment, *extra):
+    digest = hashlib.sha256()
+
+    # hash the extra items first (e.g. the model hash and the requested outcomes)
+    for i in extra:
+        digest.update(repr(i).encode())
+
+    # hash the variables in a fixed order, numbers by their value (1600, 1600.0 and np.float64(1600) give the same run)
+    for name in sorted(experiment):
+        value = experiment[name]
+        digest.update(repr(name).encode())
+        if np.ndim(value) == 0:
+            if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+                digest.update(float(value).hex().encode())
+            else:
+                digest.update(repr(value).encode())
+
+        # hash arrays by their shape and raw bytes, numeric arrays as float64
+        else:
+            array = np.asarray(value)
+            if array.dtype.kind in 'iuf':
+                array = array.astype(np.float64)
+            array = np.ascontiguousarray(array)
+            digest.update(f'{array.dtype.str}{array.shape}'.encode())
+            digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+# define a class for storing results on disk with a bounded size
+class ResultCache:
+    '''
+    Stores the outcome arrays of a run in one .npz file per key.
+
+    When the total size exceeds max_size (in bytes), the least recently
+    used entries are evicted. Entries are written atomically, so several
+    processes can share one cache directory.
+
+    '''
+
+    # create an instance of this class
+    def __init__(self, directory, max_size=2 ** 30):
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    # define a function for finding the file of a key
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.npz')
+
+    # define a function for getting the results of a key (None if they are not in the cache)
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                names = data['names'].tolist()
+                results = {name:data[f'arr_{i}'] for i, name in enumerate(names)}
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return results
+
+    # define a function for storing the results of a key
+    def put(self, key, results):
+        names = list(results.keys())
+        arrays = {f'arr_{i}':np.asarray(results[name], dtype=np.float64) for i, name in enumerate(names)}
+
+        # write the entry to a temporary file and move it in place
+        fd, path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        with os.fdopen(fd, 'wb') as fh:
+            np.savez(fh, names=np.array(names, dtype=str), **arrays)
+        os.replace(path, self._path(key))
+
+        # remove the least recently used entries if the cache has grown too large
+        self.evict()
+
+    # define a function for removing the least recently used entries until the cache fits max_size
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    # define a function for removing all entries
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(('.npz', '.tmp')):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
@@ -12,11 +12,18 @@ Created on Apr 15, 2020
 '''
 
 # import required packages
-import csv, subprocess, os, copy
+import subprocess, os, shutil, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from itertools import zip_longest
 from ema_workbench.em_framework.model import FileModel, SingleReplication
 from ema_workbench.util.ema_logging import method_logger
+from linnyr_cache import hash_experiment, hash_file #@UnresolvedImport
+from linnyr_io import aggregate, read_output_file, reduce_output_formulas, write_scenario_file #@UnresolvedImport
+from linnyr_log import parse_log_file, summarize_blocks #@UnresolvedImport
+from linnyr_model import load_model_index, patch_model #@UnresolvedImport
+from linnyr_stream import LinnyRInfeasibleError, LogTail, OutputTail #@UnresolvedImport
+from linnyr_trajectories import Linear, ScaledReference #@UnresolvedImport
 
 # define a base class for interacting with Linny-R models
 class BaseLinnyRModel(FileModel):
@@ -33,68 +40,643 @@ class BaseLinnyRModel(FileModel):
         # define the path of the Linny-R executable
         self.linnyr = os.path.join(os.path.abspath('./software'), 'lrc.exe')
         
+        # keep the scratch directory of each run (only useful for debugging, have a look at the log file)
+        self.keep_scratch = False
+        
+        # let Linny-R only compute the output formulas that are needed for the outcomes
+        self.reduce_output_formulas = False
+        
+        # keep track of the reduced model file, so it is only written once per model file and set of outcomes
+        self._reduced_model = None
+        
+        # define an optional result cache (a linnyr_cache.ResultCache), so identical experiments are only solved once
+        self.cache = None
+        
+        # keep track of the hash of the model file, so it is only computed once per modification
+        self._model_hash = None
+        
+        # define the maximum number of seconds a single Linny-R run may take (None means no limit)
+        self.timeout = None
+        
+        # define an optional sink for the telemetry of each run (an object with a record method, e.g. linnyr_log.TelemetryLog)
+        self.telemetry = None
+        
+        # define an optional journal of the completed runs (a linnyr_journal.RunJournal), so a restarted sweep skips them
+        self.journal = None
+        
+        # keep the solver status of the last run (or of each run of the last batch)
+        self._statuses = []
+        
+        # check experiments against the model file before Linny-R is started
+        self.check_experiments = True
+        
+        # define the number of time steps of the model (None means the length of time series is not checked)
+        self.time_steps = None
+        
+        # define how many values fewer than time_steps + 1 a time series may have
+        self.series_tolerance = 0
+        
+        # set scalar levers and constants (constant bounds) in a patched copy of the model file instead of the scenario file
+        self.patch_scalar_levers = False
+        
+        # keep track of the patched model files, so each policy is only written once per model file
+        self._patched_models = {}
+        
+        # define an optional store for the outcome arrays (a linnyr_store.ResultStore), so run_experiments returns handles
+        self.result_store = None
+        
+        # define an optional aggregation of output formulas while they are read: {name: (how, window)}, see linnyr_io.aggregate
+        self.aggregation = None
+        
+        # define named windows (in periods) that can be used in the aggregation, e.g. ('sum', 'day')
+        self.windows = {}
+        
+        # split the horizon into windows that are solved concurrently (1 means one run over the whole horizon)
+        self.n_windows = 1
+        
+        # define the number of periods each window starts earlier (and discards), so stocks settle before the window starts
+        self.window_warm_up = 0
+        
+        # define the trajectory generators (see linnyr_trajectories) that turn sampled values into time series: {variable: generator}
+        self.trajectories = {}
+        
+    # define a function for collecting the names of the output formulas needed for the outcomes (None means all)
+    def _output_columns(self):
+        names = [variable for outcome in self.outcomes for variable in outcome.variable_name]
+        return names if names else None
+    
+    # define a property for the (cached) index of the entities in the model file
+    @property
+    def model_index(self):
+        return load_model_index(os.path.join(self.working_directory, self.model_file))
+    
+    # define a function for collecting the Linny-R variables that are set by the uncertainties, levers and constants
+    def _input_variables(self):
+        names = [variable for parameter in list(self.uncertainties) + list(self.levers) for variable in parameter.variable_name]
+        names += [constant.name for constant in self.constants]
+        return names
+    
+    # define a function for checking the uncertainties, levers, constants and outcomes against the model file
+    def validate(self):
+        '''
+        Check that every uncertainty, lever and constant refers to an
+        'entity:attribute' of the model whose attribute can be set for the
+        kind of entity (LB, UB and IL, and Price for products) and every
+        outcome to an output formula, raising a ValueError that lists all unknown names.
+        
+        '''
+        
+        # look up all names in the index of the model file
+        index = self.model_index
+        unknown_variables = index.unknown_variables(self._input_variables())
+        unknown_formulas = index.unknown_formulas(self._output_columns() or [])
+        
+        # report all problems at once
+        problems = []
+        if unknown_variables:
+            problems.append(f'unknown variables {unknown_variables}')
+        if unknown_formulas:
+            problems.append(f'unknown output formulas {unknown_formulas}')
+        if problems:
+            raise ValueError(f'{self.model_file}: ' + ', '.join(problems))
+    
+    # define a function for checking a batch of (prepared) experiments before any Linny-R run is started
+    def validate_experiments(self, experiments):
+        '''
+        Check that all variables of the experiments exist in the model file,
+        that all values are finite numbers or one-dimensional time series,
+        and that every time series has time_steps + 1 values (the default
+        value and one per time step), or at most series_tolerance values
+        fewer (for data that does not fill the horizon exactly). A ValueError
+        lists the problems found.
+        
+        '''
+        
+        # check the variable names once for the whole batch
+        problems = []
+        names = set().union(*(i.keys() for i in experiments))
+        unknown = self.model_index.unknown_variables(sorted(names))
+        if unknown:
+            problems.append(f'unknown variables {unknown}')
+        
+        # check the values of every experiment
+        max_length = None if self.time_steps is None else self.time_steps + 1
+        min_length = None if max_length is None else max_length - self.series_tolerance
+        for i, experiment in enumerate(experiments):
+            for name, value in experiment.items():
+                array = np.asarray(value)
+                if array.dtype.kind not in 'biuf':
+                    problems.append(f'experiment {i}: {name} is not numeric')
+                elif array.ndim > 1:
+                    problems.append(f'experiment {i}: {name} has shape {array.shape}, not a time series')
+                elif max_length is not None and array.ndim == 1 and not min_length <= len(array) <= max_length:
+                    expected = max_length if min_length == max_length else f'{min_length} to {max_length}'
+                    problems.append(f'experiment {i}: {name} has {len(array)} values instead of {expected}')
+                elif not np.isfinite(array).all():
+                    problems.append(f'experiment {i}: {name} contains NaN or infinite values')
+        
+        # report the problems (but not thousands of them)
+        if problems:
+            more = f' (and {len(problems) - 10} more)' if len(problems) > 10 else ''
+            raise ValueError(f'invalid experiments for {self.model_file}: ' + '; '.join(problems[:10]) + more)
+    
+    # define a function for finding the model file a run should use (the original or a reduced copy)
+    def _model_source(self):
+        
+        # define the path of the original model file
+        source = os.path.join(self.working_directory, self.model_file)
+        columns = self._output_columns()
+        if not self.reduce_output_formulas or columns is None:
+            return source
+        
+        # write a reduced copy of the model file if the model file or the outcomes have changed
+        key = (os.path.getmtime(source), frozenset(columns))
+        if self._reduced_model is None or self._reduced_model[0] != key:
+            target = os.path.join(self.working_directory, f'{self.model_file[:-4]}_outcomes.lnr')
+            reduce_output_formulas(source, target, columns)
+            self._reduced_model = (key, target)
+        return self._reduced_model[1]
+        
+    # define a function for resolving the named windows of the aggregation (None if nothing is aggregated)
+    def _aggregation(self):
+        if not self.aggregation:
+            return None
+        return {name:(how, self.windows.get(window, window)) for name, (how, window) in self.aggregation.items()}
+    
+    # define a function for splitting an experiment into the settings patched into the model file and the rest
+    def _split_experiment(self, experiment):
+        if not self.patch_scalar_levers:
+            return {}, experiment
+        
+        # only scalar levers and constants are patched (sampled uncertainties would give a model file per run)
+        index = self.model_index
+        variables = {v for lever in self.levers for v in lever.variable_name} | {c.name for c in self.constants}
+        patches = {k:v for k, v in experiment.items()
+                   if k in variables and np.ndim(v) == 0 and index.is_patchable(k)}
+        return patches, {k:v for k, v in experiment.items() if k not in patches}
+    
+    # define a function for finding the patched copy of the model file for a policy (written once)
+    def _patched_model(self, source, patches, model_settings=None):
+        
+        # name the copy after the model file and the patched settings
+        key = hash_experiment(patches, os.path.getmtime(source), source, sorted((model_settings or {}).items()))
+        target = self._patched_models.get(key)
+        if target is None:
+            target = os.path.join(self.working_directory, f'{self.model_file[:-4]}_policy_{key[:12]}.lnr')
+            
+            # another worker process may have written it already
+            if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source):
+                patch_model(source, target, patches, model_settings)
+            self._patched_models[key] = target
+        return target
+    
+    # define a function for computing the cache key of an experiment
+    def _cache_key(self, experiment):
+        
+        # hash the model file again only if it has been modified
+        source = os.path.join(self.working_directory, self.model_file)
+        mtime = os.path.getmtime(source)
+        if self._model_hash is None or self._model_hash[0] != mtime:
+            self._model_hash = (mtime, hash_file(source))
+        
+        # combine the model hash, the requested outcomes (and their aggregation) and the (expanded) experiment, which includes any reference data
+        aggregation = self._aggregation()
+        extra = () if aggregation is None else (sorted(aggregation.items()),)
+        if self.n_windows > 1:
+            extra += (('windows', self.n_windows, self.window_warm_up),)
+        return hash_experiment(experiment, self._model_hash[1], self._output_columns(), *extra)
+    
+    # define a function for creating a private scratch directory for a single run (with the settings patched into the model)
+    def _create_scratch(self, patches=None, model_settings=None):
+        
+        # create a unique directory inside the working directory, so parallel runs never share files
+        scratch = tempfile.mkdtemp(prefix='run_', dir=self.working_directory)
+        
+        # link the model file into the scratch directory (a hard link avoids copying the .lnr for every run)
+        try:
+            source = self._model_source()
+            if patches or model_settings:
+                source = self._patched_model(source, patches, model_settings)
+            target = os.path.join(scratch, self.model_file)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+        
+        # remove the scratch directory again if the model file could not be put into it (the caller never gets it)
+        except BaseException:
+            shutil.rmtree(scratch, ignore_errors=True)
+            raise
+        
+        return scratch
+    
+    # define a function for removing the scratch directory of a run (also after a failed run)
+    def _remove_scratch(self, scratch):
+        if not self.keep_scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
 
+    # define a function for turning a sampled experiment into the variables of the scenario file
+    def prepare_experiment(self, experiment):
+        
+        # copy the experiment dict (the values are scalars, so a shallow copy is enough)
+        experiment = dict(experiment)
+        
+        # replace the sampled values that have a trajectory generator by their time series
+        for name, trajectory in self.trajectories.items():
+            if name in experiment:
+                experiment[name] = trajectory(experiment[name], self)
+        
+        # return the modified data
+        return experiment
+    
     # define a function for running an experiment
     @method_logger(__name__)
     def run_experiment(self, experiment):
         
+        # keep the sampled values for the journal
+        parameters = {k:v for k, v in experiment.items() if np.ndim(v) == 0}
         
-        # create a csv input file readable by Linny-R from the experiment dict
-        with open(self.experiment_file, 'w', newline ='') as fh:
-            
-            # define the csv writer
-            w = csv.writer(fh, delimiter = ';')
-            
-            # write the variables names to the first row
-            w.writerow(experiment.keys())
-            
-            # create a list of values where if item not already a list, make it a list (paramount for zip_longest function)
-            values = [[i] if isinstance(i,list) == False else i for i in experiment.values()]
-            
-            # write the transposed values list to the next rows (works for timeseries and accounts for empty cells)
-            w.writerows(zip_longest(*values, fillvalue = ''))
+        # modify the sampled experiment data for Linny-R and check it before starting Linny-R
+        experiment = self.prepare_experiment(experiment)
+        if self.check_experiments:
+            self.validate_experiments([experiment])
+        
+        # without a cache or a journal, simply run Linny-R
+        if self.cache is None and self.journal is None:
+            return self._run_linnyr(experiment)
+        
+        # return the results of an earlier run of a sweep that has been restarted
+        key = self._cache_key(experiment)
+        if self.journal is not None:
+            results = self.journal.get(key)
+            if results is not None:
+                return results
+        
+        # return the stored results if this experiment has been solved before
+        results = None if self.cache is None else self.cache.get(key)
+        self._statuses = [None]
+        if results is None:
+            try:
+                results = self._run_linnyr(experiment)
+            except Exception as e:
+                if self.journal is not None:
+                    self.journal.record(key, parameters, error=repr(e))
+                raise
+            if self.cache is not None:
+                self.cache.put(key, results)
+        
+        # record the run in the journal and return the results
+        if self.journal is not None:
+            self.journal.record(key, parameters, results, self._statuses[0])
+        return results
+    
+    # define a function for running a batch of experiments with as few Linny-R runs as possible
+    def run_experiments(self, experiments, batch_size=100):
+        '''
+        Run a list of experiments and return their results in the same order.
+
+        Up to batch_size experiments are written as separate scenario files
+        and solved by a single lrc invocation, so the model is loaded once
+        per batch instead of once per experiment. Every scenario file gets
+        its own output file, which is read back into the results of its
+        experiment. With a result_store, the arrays of each run are written
+        to the store as soon as its batch is done and a ResultHandle is
+        returned instead, so long sweeps do not keep them in memory.
+        Experiments are expanded into their time series (prepare_experiment)
+        one batch at a time, and dropped when the batch is done.
+
+        '''
+        
+        # check the sampled values (e.g. unknown variable names) of all experiments before starting Linny-R
+        experiments = list(experiments)
+        parameters = [{k:v for k, v in i.items() if np.ndim(v) == 0} for i in experiments]
+        if self.check_experiments and experiments:
+            self.validate_experiments(parameters)
+        results = [None] * len(experiments)
+        
+        # group the experiments by policy (the patched settings), as a batch shares one model file
+        groups = {}
+        for i, experiment in enumerate(experiments):
+            patches, _ = self._split_experiment({k:v for k, v in experiment.items() if k not in self.trajectories})
+            groups.setdefault(hash_experiment(patches), []).append(i)
+        
+        # prepare and solve the experiments one batch at a time, so only the time series of one batch are in memory
+        for group in groups.values():
+            for start in range(0, len(group), batch_size):
+                batch = group[start:start + batch_size]
+                self._run_batch([experiments[i] for i in batch], [parameters[i] for i in batch], batch, results)
+        
+        # return the results
+        return results
+    
+    # define a function for preparing, looking up and solving one batch of experiments of run_experiments
+    def _run_batch(self, experiments, parameters, indices, results):
+        
+        # modify the sampled experiment data for Linny-R and check the batch before starting Linny-R
+        experiments = [self.prepare_experiment(i) for i in experiments]
+        if self.check_experiments:
+            self.validate_experiments(experiments)
+        
+        # take the experiments that have been solved before from the journal, the store or the cache
+        found = [None] * len(experiments)
+        keys = [None] * len(experiments)
+        if self.cache is not None or self.result_store is not None or self.journal is not None:
+            keys = [self._cache_key(i) for i in experiments]
+        if self.journal is not None:
+            found = [self.journal.get(i) for i in keys]
+        columns = self._output_columns()
+        if self.result_store is not None and columns is not None:
+            found = [self.result_store.get(key, columns) if result is None else result for key, result in zip(keys, found)]
+        if self.cache is not None:
+            found = [self.cache.get(key) if result is None else result for key, result in zip(keys, found)]
+        if self.result_store is not None:
+            found = [self.result_store.put(key, result) if isinstance(result, dict) else result
+                     for key, result in zip(keys, found)]
+        for i, result in zip(indices, found):
+            results[i] = result
+        
+        # solve the remaining experiments with one Linny-R run
+        todo = [j for j, result in enumerate(found) if result is None]
+        if not todo:
+            return
+        for j, result, status in zip(todo, self._run_linnyr_batch([experiments[j] for j in todo]), self._statuses):
+            if self.journal is not None:
+                self.journal.record(keys[j], parameters[j], result, status)
+            if self.cache is not None:
+                self.cache.put(keys[j], result)
+            results[indices[j]] = result if self.result_store is None else self.result_store.put(keys[j], result)
+    
+    # define a function for running an experiment while reading its output as Linny-R writes it
+    def stream_experiment(self, experiment, poll_interval=0.5, abort_on_infeasible=True):
+        '''
+        Run an experiment and yield its progress while Linny-R is solving.
+        
+        Yields ('block', Block) for every block of periods that has been
+        solved (with its solver status), ('data', {name: array}) for the rows
+        of the output file that have been written since the previous poll,
+        and finally ('results', {name: array}) with the complete series,
+        combined from the chunks that have been read (and aggregated if an
+        aggregation is set). If abort_on_infeasible,
+        the run is killed as soon as a block is not optimal and a
+        LinnyRInfeasibleError is raised.
+        
+        '''
+        
+        # modify the sampled experiment data for Linny-R and check it before starting Linny-R
+        experiment = self.prepare_experiment(experiment)
+        if self.check_experiments:
+            self.validate_experiments([experiment])
+        
+        # create a private scratch directory for this run and start Linny-R without waiting for it
+        patches, experiment = self._split_experiment(experiment)
+        scratch = self._create_scratch(patches)
+        process = None
+        try:
+            self._write_input(scratch, experiment)
+            process = subprocess.Popen(self._command(), cwd=scratch,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            start = time.monotonic()
             
-        # define the file of the model object and strip off '.lnr' part so Linny-R can find it        
-        modelfile = self.model_file[:-4]
-
-        # execute Linny-R console using the experiment input file
-        curdir = os.getcwd()
-        
-        os.chdir(self.working_directory)
-        subprocess.call([self.linnyr, modelfile, self.experiment_file])
-        os.chdir(curdir)
-
-        # locate and define the output file
-        outputfile = os.path.join(self.working_directory, f'{modelfile}_exp.csv')
-        
-        # read the data from the output file into a dataframe
-        data = pd.read_csv(outputfile, delimiter=';', decimal=',')
-                         
-        # create an empty dictionary for the results
-        results = {}
-                         
-        # loop trough the output variables                
-        for i in data.columns:
-                         
-            # skip the time variable           
-            if i == 'T':
-                continue
-                         
-            # fill in the dictionary with the values in a tuple         
-            else:
-                results[i] = tuple(data[i])
+            # follow the log file and the output file
+            stem = f'{self.model_file[:-4]}_{os.path.splitext(self.experiment_file)[0]}'
+            log = LogTail(os.path.join(scratch, f'{stem}.log'))
+            output = OutputTail(os.path.join(scratch, f'{stem}.csv'), self._output_columns())
+            while True:
+                finished = process.poll() is not None
+                
+                # report the blocks that have been solved (and stop at the first one that could not be solved)
+                for block in log.read_blocks(final=finished):
+                    yield ('block', block)
+                    if abort_on_infeasible and block.status != 'optimal':
+                        raise LinnyRInfeasibleError(f'periods {block.start}-{block.end} are {block.status}')
+                
+                # report the rows that have been written
+                chunk = output.read_chunk(final=finished)
+                if chunk is not None:
+                    yield ('data', chunk)
+                if finished:
+                    break
                 
-        # delete the csv input file
-        #os.remove(self.experiment_file)
+                # stop Linny-R if it takes too long
+                if self.timeout is not None and time.monotonic() - start > self.timeout:
+                    raise subprocess.TimeoutExpired(self._command(), self.timeout)
+                time.sleep(poll_interval)
+            
+            # report the complete series (aggregated like the output of a normal run)
+            yield ('results', self._aggregate(output.results()))
+        
+        # stop Linny-R if it is still running and delete the scratch directory
+        finally:
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+            self._remove_scratch(scratch)
+    
+    # define a function for naming the scenario file of an experiment in a batch (None for a single run)
+    def _scenario_file(self, index=None):
+        if index is None:
+            return self.experiment_file
+        stem, extension = os.path.splitext(self.experiment_file)
+        return f'{stem}_{index}{extension}'
+    
+    # define a function for creating the command that runs the Linny-R console
+    def _command(self, scenario_files=None):
+        
+        # define the file of the model object and strip off '.lnr' part so Linny-R can find it
+        return [self.linnyr, self.model_file[:-4], *(scenario_files or [self.experiment_file])]
+    
+    # define a function for writing the scenario file of an experiment into a scratch directory
+    def _write_input(self, scratch, experiment, scenario_file=None):
+        
+        # create a csv input file readable by Linny-R from the experiment dict
+        write_scenario_file(os.path.join(scratch, scenario_file or self.experiment_file), experiment)
+    
+    # define a function for reading the results of a run from a scratch directory
+    def _read_output(self, scratch, scenario_file=None, aggregated=True):
+        
+        # locate and define the output file (Linny-R names it after the model and the scenario file)
+        scenario = os.path.splitext(scenario_file or self.experiment_file)[0]
+        outputfile = os.path.join(scratch, f'{self.model_file[:-4]}_{scenario}.csv')
+        
+        # read the output variables needed for the outcomes into arrays (aggregated while they are read)
+        return read_output_file(outputfile, self._output_columns(), self._aggregation() if aggregated else None)
+    
+    # define a function for aggregating complete series that have been read without aggregation
+    def _aggregate(self, results):
+        aggregation = self._aggregation() or {}
+        return {k:aggregate(v, *aggregation[k]) if k in aggregation else v for k, v in results.items()}
+    
+    # define a function for recording the telemetry of a run (the phase timings and the metrics of the solver log)
+    def _record_telemetry(self, scratch, timings, scenario_file=None, **extra):
+        if self.telemetry is None and self.journal is None:
+            return {}
+        
+        # parse the solver log of the run (if Linny-R wrote one)
+        scenario = os.path.splitext(scenario_file or self.experiment_file)[0]
+        logfile = os.path.join(scratch, f'{self.model_file[:-4]}_{scenario}.log')
+        solver = summarize_blocks(parse_log_file(logfile)) if os.path.exists(logfile) else {}
+        
+        # send the telemetry to the sink and return the metrics of the solver
+        if self.telemetry is not None:
+            telemetry = {'model':self.name, 'time':time.time(), 'pid':os.getpid(), **timings, **solver, **extra}
+            self.telemetry.record(telemetry)
+        return solver
+    
+    # define a function for solving experiments in a scratch directory with one Linny-R console run
+    def _solve_in_scratch(self, scratch, experiments, scenario_files=None, run=None, aggregated=True, **extra):
+        '''
+        Write the scenario file of each experiment into scratch, run the
+        Linny-R console once for all of them, read their output and record
+        the telemetry of each experiment (with its share of the time of the
+        run). Return the results and the solver statuses of the experiments.
 
-        # delete the output files (if things dont work out, have a look at the log file)
-        #os.remove(f'{modelfile}_exp.csv')
-        #os.remove(f'{modelfile}_exp.lp')
-        #os.remove(f'{modelfile}_exp.log')
+        scenario_files names the scenario file of each experiment (None for
+        a single experiment in the default scenario file). run(command, cwd,
+        timeout) starts the console (subprocess.run by default); the timeout
+        applies to each experiment.
 
+        '''
+        
+        # create a csv input file readable by Linny-R for each experiment
+        files = scenario_files or [None]
+        start = time.perf_counter()
+        for experiment, scenario_file in zip(experiments, files):
+            self._write_input(scratch, experiment, scenario_file)
+        written = time.perf_counter()
+        
+        # execute Linny-R console inside the scratch directory (without changing the working directory of the process)
+        timeout = None if self.timeout is None else self.timeout * len(experiments)
+        if run is None:
+            subprocess.run(self._command(scenario_files), cwd=scratch, timeout=timeout)
+        else:
+            run(self._command(scenario_files), scratch, timeout)
+        solved = time.perf_counter()
+        
+        # read the output variables needed for the outcomes into arrays
+        results = [self._read_output(scratch, i, aggregated) for i in files]
+        
+        # record the time spent in each phase and the solver metrics
+        n = len(experiments)
+        timings = {'write_input':(written - start) / n, 'solver':(solved - written) / n,
+                   'read_output':(time.perf_counter() - solved) / n}
+        if scenario_files is not None:
+            extra['batch_size'] = n
+        statuses = [self._record_telemetry(scratch, timings, i, **extra).get('status') for i in files]
+        return results, statuses
+    
+    # define a function for solving an experiment and returning its results and solver status (without changing the model)
+    def _solve(self, experiment, run=None):
+        
+        # solve the windows of a long horizon concurrently
+        if self.n_windows > 1:
+            return self._run_windows(experiment, run)
+        
+        # create a private scratch directory for this run
+        patches, experiment = self._split_experiment(experiment)
+        scratch = self._create_scratch(patches)
+        try:
+            results, statuses = self._solve_in_scratch(scratch, [experiment], run=run)
+        
+        # delete the scratch directory with the input file and the output files (.csv, .lp and .log)
+        finally:
+            self._remove_scratch(scratch)
+        return results[0], statuses[0]
+    
+    # define a function for running an experiment with the Linny-R console
+    def _run_linnyr(self, experiment):
+        results, status = self._solve(experiment)
+        self._statuses = [status]
+        return results
+    
+    # define a function for running a batch of experiments with a single Linny-R console run
+    def _run_linnyr_batch(self, experiments):
+        
+        # split each experiment into windows instead of batching them
+        if self.n_windows > 1:
+            results, self._statuses = map(list, zip(*(self._run_windows(i) for i in experiments)))
+            return results
+        
+        # split off the settings that are patched into the model file (the same for every experiment in a batch)
+        split = [self._split_experiment(i) for i in experiments]
+        patches = split[0][0]
+        if any(i[0] != patches for i in split):
+            raise ValueError('the experiments in a batch must share the patched settings (group them by policy)')
+        experiments = [i[1] for i in split]
+        
+        # create a private scratch directory for this batch and solve a scenario file per experiment
+        scratch = self._create_scratch(patches)
+        try:
+            scenario_files = [self._scenario_file(i) for i in range(len(experiments))]
+            results, self._statuses = self._solve_in_scratch(scratch, experiments, scenario_files)
+        
+        # delete the scratch directory with the input files and the output files
+        finally:
+            self._remove_scratch(scratch)
+        
         # return the results
         return results
 
+    # define a function for splitting the run period of the model into windows: (first period solved, first period kept, last period, last period of data)
+    def _windows(self):
+        settings = self.model_index.settings
+        first = int(settings.get('start-period') or 1)
+        last = int(settings.get('end-period') or self.time_steps or 0)
+        if last < first:
+            raise ValueError(f'{self.model_file} has no run period (start-period and end-period) to split into windows')
+        look_ahead = int(settings.get('look-ahead-period') or 0)
+        bounds = np.linspace(first - 1, last, self.n_windows + 1).round().astype(int).tolist()
+        return [(max(first, a + 1 - self.window_warm_up), a + 1, b, b + look_ahead)
+                for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    
+    # define a function for running one window of an experiment (a copy of the model with the start and end period of the window)
+    def _run_window(self, experiment, patches, number, window, run=None):
+        solve_start, start, end, data_end = window
+        
+        # keep the periods up to the end of the window and its look-ahead of each time series (Linny-R reads period T from row T)
+        sliced = {name:values[:data_end + 1] if np.ndim(values) else values for name, values in experiment.items()}
+        
+        # run Linny-R on a copy of the model that only simulates the window
+        scratch = self._create_scratch(patches, {'start-period':solve_start, 'end-period':end})
+        try:
+            (results,), (status,) = self._solve_in_scratch(scratch, [sliced], run=run, aggregated=False, window=number)
+        finally:
+            self._remove_scratch(scratch)
+        
+        # drop the warm-up periods (and any look-ahead periods after the window)
+        offset = start - solve_start
+        for name, values in results.items():
+            if len(values) < offset + end - start + 1:
+                raise ValueError(f'window {number} (periods {start}-{end}) returned {len(values)} values for {name}')
+            results[name] = values[offset:offset + end - start + 1]
+        return results, status
+    
+    # define a function for running an experiment as concurrent windows and stitching the output series together
+    def _run_windows(self, experiment, run=None):
+        '''
+        Solve an experiment as n_windows Linny-R runs over consecutive parts
+        of the run period of the model (start-period to end-period), at the
+        same time, and concatenate their output.
+
+        Every window gets a copy of the model with its own start and end
+        period, so the periods keep their numbers and the data in the model
+        itself is read for the right periods, and the time series up to the
+        end of the window and its look-ahead. A window starts window_warm_up
+        periods early and these periods are dropped, so the stocks at the
+        start of a window are close to those at the end of the previous one;
+        without warm-up every window starts from the initial stocks of the
+        model. Returns the results and the solver status of the experiment.
+
+        '''
+        
+        patches, experiment = self._split_experiment(experiment)
+        windows = self._windows()
+        with ThreadPoolExecutor(len(windows)) as executor:
+            parts, statuses = zip(*executor.map(lambda i: self._run_window(experiment, patches, i, windows[i], run), range(len(windows))))
+        
+        # stitch the windows together and aggregate the complete series (the status is that of the first window that is not optimal)
+        results = self._aggregate({name:np.concatenate([i[name] for i in parts]) for name in parts[0]})
+        return results, next((i for i in statuses if i != 'optimal'), statuses[0])
+
 # define the base class
 class LinnyRModel(SingleReplication, BaseLinnyRModel):
     pass
@@ -103,30 +685,32 @@ class LinnyRModel(SingleReplication, BaseLinnyRModel):
 class LinnyRModel_Botlek(LinnyRModel):
     
     # create an instance of this class
-    def __init__(self, name, wd=None, model_file=None):
+    def __init__(self, name, wd=None, model_file=None, time_horizon=1):
         
         # inherit properties from the base class (the generic Linny-R connector)
         super().__init__(name, wd, model_file)
     
-        # import reference scenarios from the electricity market data as lists
-        data_path = os.path.join(os.path.abspath('./data'), 'electricity_data.csv')
-        electricity_data = pd.read_csv(data_path)
-        upward_price_ref = list(electricity_data['invoeden_EURMWh'])
-        downward_price_ref = list(electricity_data['afnemen_EURMWh'])
-        imbalance_demand_ref = list(electricity_data['imbalance_demand']/1000)
-        imbalance_supply_ref = list(electricity_data['imbalance_supply']/1000)
-
-        # insert the first number as a default value at the beginning of the list (for Linny-R specific input)
-        upward_price_ref.insert(0, upward_price_ref[0])
-        downward_price_ref.insert(0, downward_price_ref[0])
-        imbalance_demand_ref.insert(0, imbalance_demand_ref[0])
-        imbalance_supply_ref.insert(0, imbalance_supply_ref[0])
-
-        # create a dictionary for the time serie reference scenarios
-        self.reference_time_series = {'Unbal opregelen:Price':upward_price_ref, 
-                                      'Unbal afregelen:Price':downward_price_ref,
-                                      'Unbal afregelen:LB':imbalance_supply_ref,
-                                      'Unbal opregelen:UB':imbalance_demand_ref}
+        # specify the time horizon in years
+        self.time_horizon = time_horizon
+
+        # define the number of time steps (quarters) in that time horizon
+        self.time_steps = 35040 * self.time_horizon
+        
+        # the electricity data has 35036 quarters per year instead of 35040, so the reference series are 4 values short per year
+        self.series_tolerance = 4 * self.time_horizon
+        
+        # start each window of a split horizon (n_windows > 1) a day early, so the stocks have settled at its start
+        self.window_warm_up = 96
+        
+        # define the windows for aggregating the outcomes, e.g. aggregation = {'CF total': ('sum', 'month')}
+        self.windows = {'day':96, 'week':7 * 96, 'month':35040 // 12, 'year':35040, 'horizon':self.time_steps}
+
+        # define the electricity market data the time serie reference scenarios are based on (read when first needed)
+        self.data_path = os.path.join(os.path.abspath('./data'), 'electricity_data.csv')
+        
+        # define the names of the time serie reference scenarios
+        self._reference_names = ['Unbal opregelen:Price', 'Unbal afregelen:Price', 'Unbal afregelen:LB', 'Unbal opregelen:UB']
+        self._reference = None
 
         # create a dictionary for current values
         self.current_values = {'E day-ahead:Price':57,
@@ -134,29 +718,71 @@ class LinnyRModel_Botlek(LinnyRModel):
                                'CO2 EUROPEAN EMISSION ALLOWANCES:Price':25,
                                'H2 markt:Price':0.107,
                                'NaOH 50%:Price':200}
-
-        # set the number of time steps
-        self.time_steps = 35040
+        
+        # scale the reference time series by the sampled factors, and go linearly from the current values to the sampled values in 2030
+        self.trajectories = {name:ScaledReference(name) for name in self._reference_names}
+        self.trajectories.update({name:Linear(value) for name, value in self.current_values.items()})
     
-    # define a function for running an experiment
-    def run_experiment(self, experiment):
+    # define a function for pickling the model without its arrays (workers attach to the reference file instead)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_reference'] = None
+        return state
+    
+    # define a function for turning one year of electricity data into a reference array over the time horizon
+    def _reference_array(self, column):
         
-        experiment = copy.deepcopy(experiment)
-        
-        # modify the sampled experiment data accordingly
-        for i in experiment.keys():
-            if i in self.reference_time_series.keys():
-                experiment[i] = [ experiment[i] * x for x in self.reference_time_series[i] ]
-            elif i in self.current_values.keys():
-                current_value = self.current_values[i]
-                future_value = experiment[i]
-                gradient =  (future_value - current_value) / self.time_steps
-                experiment[i] = [ gradient * x + current_value for x in range(self.time_steps + 1) ]
-            else:
-                continue
-        
-        # let the base class (generic Linny-R connector) run an experiment using this modified data
-        return super().run_experiment(experiment)
+        # repeat the yearly data for each year in the time horizon
+        values = np.tile(np.asarray(column, dtype=np.float64), self.time_horizon)
+        
+        # insert the first number as a default value at the beginning of the array (for Linny-R specific input)
+        return np.concatenate((values[:1], values))
+    
+    # define a function for creating the reference scenarios from the electricity market data
+    def _create_reference(self):
+        
+        # import reference scenarios from the electricity market data as arrays
+        electricity_data = pd.read_csv(self.data_path)
+        return np.vstack([self._reference_array(electricity_data['invoeden_EURMWh']),
+                          self._reference_array(electricity_data['afnemen_EURMWh']),
+                          self._reference_array(electricity_data['imbalance_supply']/1000),
+                          self._reference_array(electricity_data['imbalance_demand']/1000)])
+    
+    # define a function for finding the binary file with the reference scenarios (named after the hash of the data)
+    def _reference_file(self):
+        stem = os.path.splitext(self.data_path)[0]
+        return f'{stem}_reference_{self.time_horizon}_{hash_file(self.data_path)[:16]}.npy'
+    
+    # define a function for writing the reference scenarios to the reference file (atomically, other processes may read it)
+    def _write_reference_file(self, reference, reference_file):
+        fd, path = tempfile.mkstemp(suffix='.npy', dir=os.path.dirname(reference_file))
+        with os.fdopen(fd, 'wb') as fh:
+            np.save(fh, reference)
+        os.replace(path, reference_file)
+        
+        # remove the reference files of older versions of the data (best effort, other processes may still use them)
+        prefix = f'{os.path.basename(os.path.splitext(self.data_path)[0])}_reference_{self.time_horizon}_'
+        for entry in os.scandir(os.path.dirname(reference_file)):
+            if entry.name.startswith(prefix) and entry.name.endswith('.npy') and entry.path != reference_file:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+    
+    # define a property for the dictionary of the time serie reference scenarios (read-only views of the memory-mapped file)
+    @property
+    def reference_time_series(self):
+        if self._reference is None:
+            
+            # convert the electricity market data only if there is no binary file for this version of the data yet
+            reference_file = self._reference_file()
+            if not os.path.exists(reference_file):
+                self._write_reference_file(self._create_reference(), reference_file)
+            
+            # memory-map the binary file read-only, so all worker processes share it
+            reference = np.load(reference_file, mmap_mode='r')
+            self._reference = dict(zip(self._reference_names, reference))
+        return self._reference
 
 
 # In[ ]:
@@ -0,0 +1,272 @@
+'''
+Coordinator and workers for running experiments of a Linny-R model on several machines.
+
+Start a worker on every node (in a directory with the connector modules, the
+model directory, the data and the Linny-R console), e.g.:
+
+    LINNYR_AUTHKEY=secret python linnyr_distributed.py --host coordinator.example.org --port 6000
+
+and run the experiments from the coordinator with LinnyRCoordinator.
+
+'''
+
+# import required packages
+import argparse, io, itertools, os, queue, threading, time
+from collections import deque
+from multiprocessing.connection import Client, Listener, wait
+from multiprocessing import AuthenticationError
+
+import numpy as np
+
+
+# define a function for compressing the outcome arrays of a run for the transfer to the coordinator
+def encode_results(results):
+    buffer = io.BytesIO()
+    names = list(results)
+    np.savez_compressed(buffer, names=np.array(names, dtype=str),
+                        **{f'arr_{i}':np.asarray(results[name], dtype=np.float64) for i, name in enumerate(names)})
+    return buffer.getvalue()
+
+
+# define a function for decompressing the outcome arrays of a run
+def decode_results(data):
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        return {name:arrays[f'arr_{i}'] for i, name in enumerate(arrays['names'].tolist())}
+
+
+# define an exception for an experiment that failed on a worker (or on too many workers)
+class LinnyRWorkerError(RuntimeError):
+    pass
+
+
+# define a class for handing out experiments to the workers that connect to it
+class LinnyRCoordinator:
+    '''
+    Sends experiments of a BaseLinnyRModel to the workers that connect to
+    address (a (host, port) tuple, port 0 picks a free port) and collects
+    their results.
+
+    Every worker receives the model once, when it connects, and then one
+    experiment descriptor at a time: the sampled values, which the worker
+    expands into time series itself (prepare_experiment). Workers send back
+    the outcome arrays compressed. When a worker is lost (its connection
+    breaks or a run takes longer than task_timeout seconds) its experiment
+    goes back to the queue; an experiment is given up after max_retries
+    lost attempts. Every task has a unique id that the worker sends back,
+    so results of tasks from an earlier (failed) call are discarded. If
+    there is no worker for connect_timeout seconds (None waits forever),
+    run_experiments raises a LinnyRWorkerError. Connections are
+    authenticated with authkey.
+
+    '''
+
+    # create an instance of this class and start listening for workers
+    def __init__(self, model, address=('localhost', 0), authkey=None, max_retries=2, task_timeout=None, connect_timeout=300):
+        if not authkey:
+            raise ValueError('an authkey is needed, so only your own workers can connect')
+        self.model = model
+        self.max_retries = max_retries
+        self.task_timeout = task_timeout
+        self.connect_timeout = connect_timeout
+        self._listener = Listener(address, authkey=authkey)
+        self._connections = queue.Queue()
+        self._workers = []
+        self._task_ids = itertools.count()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    # define a property for the address the workers connect to
+    @property
+    def address(self):
+        return self._listener.address
+
+    # define a function for accepting workers (in a thread)
+    def _accept(self):
+        while True:
+            try:
+                self._connections.put(self._listener.accept())
+            except AuthenticationError:
+                continue
+            except OSError:
+                return
+
+    # define a function for adding the workers that have connected (they get the model first)
+    def _add_workers(self, idle):
+        while True:
+            try:
+                connection = self._connections.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                connection.send(('model', None, self.model))
+            except OSError:
+                continue
+            self._workers.append(connection)
+            idle.append(connection)
+
+    # define a function for running experiments on the workers and returning their results in the same order
+    def run_experiments(self, experiments, return_exceptions=False):
+        experiments = list(experiments)
+        results = [None] * len(experiments)
+        attempts = [0] * len(experiments)
+        pending = deque(range(len(experiments)))
+        remaining = len(experiments)
+        idle = deque(self._workers)
+        busy = {}
+        waiting = None
+
+        # define a function for handling a lost worker (its experiment is tried again, up to max_retries times)
+        def lost(connection, reason):
+            nonlocal remaining
+            _, index, _ = busy.pop(connection)
+            self._workers.remove(connection)
+            connection.close()
+            attempts[index] += 1
+            if attempts[index] <= self.max_retries:
+                pending.appendleft(index)
+                return
+            error = LinnyRWorkerError(f'experiment {index} failed on {attempts[index]} workers ({reason})')
+            if not return_exceptions:
+                raise error
+            results[index] = error
+            remaining -= 1
+
+        while remaining:
+            self._add_workers(idle)
+
+            # give each idle worker an experiment
+            while idle and pending:
+                connection = idle.popleft()
+                index = pending.popleft()
+                task_id = next(self._task_ids)
+                busy[connection] = (task_id, index, time.monotonic())
+                try:
+                    connection.send(('task', task_id, experiments[index]))
+                except OSError as e:
+                    lost(connection, repr(e))
+
+            # wait for workers to connect (if there are none, e.g. because all of them have been lost)
+            if not busy:
+                waiting = waiting or time.monotonic()
+                if self.connect_timeout is not None and time.monotonic() - waiting > self.connect_timeout:
+                    raise LinnyRWorkerError(f'no worker for {self.connect_timeout} s, {remaining} experiment(s) not run')
+                time.sleep(0.1)
+                continue
+            waiting = None
+
+            # wait for results
+            for connection in wait(list(busy), timeout=0.5):
+                try:
+                    kind, task_id, payload = connection.recv()
+                except (EOFError, OSError) as e:
+                    lost(connection, repr(e) if str(e) else 'connection closed')
+                    continue
+
+                # skip the result of a task of an earlier call (the worker is still busy with the task of this call)
+                if task_id != busy[connection][0]:
+                    continue
+                _, index, _ = busy.pop(connection)
+                idle.append(connection)
+                remaining -= 1
+                if kind == 'result':
+                    results[index] = decode_results(payload)
+                elif return_exceptions:
+                    results[index] = LinnyRWorkerError(f'experiment {index}: {payload}')
+                else:
+                    raise LinnyRWorkerError(f'experiment {index}: {payload}')
+
+            # give up on workers that take too long
+            if self.task_timeout is not None:
+                for connection, (_, _, started) in list(busy.items()):
+                    if time.monotonic() - started > self.task_timeout:
+                        lost(connection, f'no result after {self.task_timeout} s')
+        return results
+
+    # define a function for stopping the workers and closing the listener
+    def close(self):
+        for connection in self._workers:
+            try:
+                connection.send(('stop', None, None))
+                connection.close()
+            except OSError:
+                pass
+        self._workers = []
+        self._listener.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# define a class for a worker that runs the experiments it gets from a coordinator
+class LinnyRWorker:
+    '''
+    Connects to a LinnyRCoordinator, receives the model and runs the
+    experiments it is sent until the coordinator stops it. overrides sets
+    attributes of the received model for this node (e.g. the path of the
+    Linny-R console in 'linnyr', 'working_directory' or the 'data_path' of
+    the Botlek model, which are paths on the coordinator). The model stays
+    loaded between experiments, so reference data and model variants are
+    only prepared once per worker.
+
+    '''
+
+    # create an instance of this class
+    def __init__(self, address, authkey, overrides=None):
+        self.address = address
+        self.authkey = authkey
+        self.overrides = overrides or {}
+
+    # define a function for running experiments until the coordinator stops (or is gone)
+    def run(self):
+        connection = Client(self.address, authkey=self.authkey)
+        model = None
+        try:
+            while True:
+                try:
+                    kind, task_id, payload = connection.recv()
+                except EOFError:
+                    return
+                if kind == 'stop':
+                    return
+                if kind == 'model':
+                    model = payload
+                    for name, value in self.overrides.items():
+                        setattr(model, name, value)
+                    continue
+
+                # run the experiment and send back its compressed results (or the error) with the id of the task
+                try:
+                    reply = ('result', task_id, encode_results(model.run_experiment(payload)))
+                except Exception as e:
+                    reply = ('error', task_id, repr(e))
+
+                # stop if the coordinator has gone (or has given up on this worker)
+                try:
+                    connection.send(reply)
+                except OSError:
+                    return
+        finally:
+            connection.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='localhost', help='host of the coordinator')
+    parser.add_argument('--port', type=int, required=True, help='port of the coordinator')
+    parser.add_argument('--linnyr', help='path of the Linny-R console on this node')
+    parser.add_argument('--wd', help='working directory (with the model file) on this node')
+    parser.add_argument('--data', help='electricity data (data_path of the Botlek model) on this node')
+    args = parser.parse_args()
+
+    # the authkey is read from the environment, so it does not show up in the process list
+    overrides = {}
+    if args.linnyr:
+        overrides['linnyr'] = os.path.abspath(args.linnyr)
+    if args.wd:
+        overrides['working_directory'] = os.path.abspath(args.wd)
+    if args.data:
+        overrides['data_path'] = os.path.abspath(args.data)
+    LinnyRWorker((args.host, args.port), os.environ['LINNYR_AUTHKEY'].encode(), overrides).run()
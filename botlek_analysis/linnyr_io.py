@@ -0,0 +1,267 @@
+'''
+Reading and writing the files exchanged with the Linny-R console (lrc).
+
+'''
+
+# import required packages
+import os, re, tempfile
+from xml.sax.saxutils import unescape
+
+import numpy as np
+import pandas as pd
+
+# define the delimiter and line terminator of the Linny-R scenario format (same as csv.writer with delimiter ';')
+DELIMITER = ';'
+LINE_TERMINATOR = '\r\n'
+
+# define the encoding of Linny-R model files (latin-1 also round-trips every byte unchanged)
+MODEL_ENCODING = 'iso-8859-1'
+
+# define the patterns for the output formulas in a Linny-R model file
+FORMULA_PATTERN = re.compile(r'<formula\b.*?</formula>\s*', re.S)
+FORMULA_NAME_PATTERN = re.compile(r'<name>(.*?)</name>', re.S)
+FORMULA_EXPRESSION_PATTERN = re.compile(r'<expression>(.*?)</expression>', re.S)
+
+
+# define a function for quoting a field the way csv.writer does (only when it contains special characters)
+def _quote(field):
+    field = str(field)
+    if any(c in field for c in (DELIMITER, '"', '\r', '\n')):
+        return '"' + field.replace('"', '""') + '"'
+    return field
+
+
+# define a function for formatting floats with a fixed number of decimals using integer arithmetic
+def _format_fixed(array, decimals):
+    scale = 10 ** decimals
+    scaled = np.rint(np.abs(array) * scale)
+
+    # fall back to the exact representation for values that do not fit an int64
+    if not np.all(np.isfinite(scaled)) or (scaled.size and scaled.max() >= 2 ** 62):
+        return array.astype(str)
+
+    # format the integer and fractional parts separately and strip the trailing zeros
+    scaled = scaled.astype(np.int64)
+    text = np.char.add(np.char.add((scaled // scale).astype(str), '.'),
+                       np.char.zfill((scaled % scale).astype(str), decimals))
+    text = np.char.rstrip(np.char.rstrip(text, '0'), '.')
+    return np.where((array < 0) & (scaled > 0), np.char.add('-', text), text)
+
+
+# define a function for formatting a numeric array as a list of strings
+def _format_numeric(array, decimals):
+
+    # format each distinct value once (scaled reference series only have a few thousand distinct values)
+    unique, inverse = np.unique(array, return_inverse=True)
+    if len(unique) * 2 <= len(array):
+        return np.asarray(_format_numeric_values(unique, decimals), dtype=object)[inverse].tolist()
+    return _format_numeric_values(array, decimals)
+
+
+# define a function for formatting numeric values, exactly (shortest representation) or with fixed decimals
+def _format_numeric_values(array, decimals):
+    if decimals is None or array.dtype.kind != 'f':
+        return array.astype(str).tolist()
+    return _format_fixed(array, decimals).tolist()
+
+
+# define a function for formatting one time series as a column of strings
+def _format_column(value, n_rows, decimals):
+    array = np.asarray(value)
+
+    # format numeric columns in bulk, anything else one cell at a time
+    if array.dtype.kind in 'biuf':
+        column = _format_numeric(array, decimals)
+    else:
+        column = [_quote(i) for i in array.tolist()]
+
+    # pad shorter (ragged) columns with empty cells
+    return column + [''] * (n_rows - len(column))
+
+
+# define a function for writing an experiment dict to a Linny-R scenario file
+def write_scenario_file(path, experiment, decimals=None):
+    '''
+    Write an experiment dict as a ';'-delimited Linny-R scenario file.
+
+    Values can be scalars, lists or NumPy arrays. Time series are formatted
+    column by column, scalars only fill the first row, shorter columns are
+    padded with empty cells, and the file is written with a single write.
+    By default floats are written exactly; pass decimals to round them to a
+    fixed number of decimals, which is faster for long series.
+
+    '''
+
+    # split the experiment in time series and scalars (Linny-R matches columns by name, so the order is free)
+    series = {k:v for k, v in experiment.items() if np.ndim(v) > 0}
+    scalars = {k:v for k, v in experiment.items() if np.ndim(v) == 0}
+
+    # determine the number of rows (the length of the longest time series)
+    n_rows = max([1] + [len(i) for i in series.values()])
+
+    # format every time series as a column of strings and transpose them to rows
+    columns = [_format_column(i, n_rows, decimals) for i in series.values()]
+    rows = list(map(DELIMITER.join, zip(*columns))) if columns else [''] * n_rows
+
+    # the scalars only fill the first row, on the other rows they are empty cells
+    if scalars:
+        first = [_quote(i) for i in scalars.values()]
+        rows[0] = DELIMITER.join(([rows[0]] if columns else []) + first)
+        suffix = DELIMITER * (len(scalars) if columns else len(scalars) - 1)
+    else:
+        suffix = ''
+
+    # write the header and the rows with one large buffered write
+    header = DELIMITER.join(_quote(i) for i in [*series, *scalars])
+    body = rows[0] + LINE_TERMINATOR
+    if n_rows > 1:
+        body += (suffix + LINE_TERMINATOR).join(rows[1:]) + suffix + LINE_TERMINATOR
+    with open(path, 'w', newline='') as fh:
+        fh.write(header + LINE_TERMINATOR + body)
+
+
+# define a function for guessing the decimal separator of a Linny-R output file from its first rows (depends on the locale of lrc)
+def _detect_decimal(path):
+    with open(path) as fh:
+        fh.readline()
+        sample = fh.read(65536)
+    return ',' if ',' in sample else '.'
+
+
+# define a function for reading a Linny-R output file into NumPy arrays
+def read_output_file(path, columns=None, aggregation=None):
+    '''
+    Read a Linny-R <model>_exp.csv output file into a dict of float64 arrays.
+
+    The file is parsed in a single pass by the C parser of pandas, with the
+    decimal separator ('.' or ',') detected from the start of the data (the
+    file is parsed again with ',' if a later value has a decimal comma).
+    The time column 'T' is skipped. Pass columns to only parse the named output formulas; a
+    ValueError is raised if any of them is missing from the file.
+    aggregation maps output formulas to (how, window) and returns their
+    aggregated series instead (see aggregate).
+
+    '''
+
+    # only parse the requested columns (if any)
+    wanted = None if columns is None else set(columns)
+    usecols = None if wanted is None else (lambda name: name in wanted)
+    decimal = _detect_decimal(path)
+    try:
+        data = pd.read_csv(path, delimiter=DELIMITER, decimal=decimal, usecols=usecols, dtype=np.float64)
+
+    # the detection only looks at the start of the file, so read it again with a decimal comma if a later value has one
+    except ValueError:
+        if decimal == ',':
+            raise
+        data = pd.read_csv(path, delimiter=DELIMITER, decimal=',', usecols=usecols, dtype=np.float64)
+
+    # check that all requested columns were found
+    if columns is not None:
+        missing = [i for i in columns if i not in data.columns]
+        if missing:
+            raise ValueError(f'output formula(s) {missing} not found in {path}')
+
+    # return every column (except the time variable) as a contiguous array
+    names = [i for i in data.columns if i != 'T']
+    if not aggregation:
+        return {i:np.ascontiguousarray(data[i].to_numpy()) for i in names}
+
+    # aggregate the columns with the same aggregation together (one reduction over a matrix of columns)
+    groups = {}
+    for i in names:
+        groups.setdefault(aggregation.get(i), []).append(i)
+    results = {}
+    for key, group in groups.items():
+        matrix = data[group].to_numpy()
+        if key is not None:
+            matrix = aggregate(matrix, *key)
+        results.update({name:np.ascontiguousarray(matrix[:, i]) for i, name in enumerate(group)})
+    return {i:results[i] for i in names}
+
+
+# define the ways a series can be aggregated
+AGGREGATIONS = ('sum', 'mean', 'min', 'max', 'cumulative')
+
+
+# define a function for aggregating a series (or the columns of a matrix) per window of periods
+def aggregate(values, how, window=None):
+    '''
+    Aggregate values (a series, or a matrix with a series per column) per
+    window of periods, e.g. 96 for days at a 15-minute resolution.
+
+    how is 'sum', 'mean', 'min' or 'max' of each window, or 'cumulative'
+    for the running total at the end of each window. The last window may be
+    shorter. Without a window the whole series is one window (so
+    'cumulative' gives the running total of every period).
+
+    '''
+
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if how not in AGGREGATIONS:
+        raise ValueError(f'unknown aggregation {how!r}, use one of {AGGREGATIONS}')
+
+    # the running total, at the end of each window
+    if how == 'cumulative':
+        totals = np.cumsum(values, axis=0)
+        if window is None:
+            return totals
+        return totals[np.minimum(np.arange(window, n + window, window), n) - 1]
+
+    # reduce each window (the starts of the windows are the boundaries for reduceat)
+    starts = np.arange(0, n, window or max(n, 1))
+    if n == 0:
+        return values
+    if how == 'min':
+        return np.minimum.reduceat(values, starts, axis=0)
+    if how == 'max':
+        return np.maximum.reduceat(values, starts, axis=0)
+    sums = np.add.reduceat(values, starts, axis=0)
+    if how == 'sum':
+        return sums
+    counts = np.diff(np.append(starts, n))
+    return sums / (counts if values.ndim == 1 else counts[:, None])
+
+
+# define a function for writing a copy of a Linny-R model file with only the requested output formulas
+def reduce_output_formulas(source, target, keep):
+    '''
+    Write a copy of the model file source to target without the output
+    formulas that are not in keep.
+
+    Formulas that are referenced by a kept formula (as [name]) are kept as
+    well. The rest of the file is copied byte for byte, and target is
+    replaced atomically so parallel runs never see a partial file.
+
+    '''
+
+    # read the model file and collect the name and expression of every output formula
+    with open(source, encoding=MODEL_ENCODING, newline='') as fh:
+        text = fh.read()
+    formulas = {}
+    for match in FORMULA_PATTERN.finditer(text):
+        name = FORMULA_NAME_PATTERN.search(match.group(0))
+        expression = FORMULA_EXPRESSION_PATTERN.search(match.group(0))
+        formulas[unescape(name.group(1)) if name else ''] = unescape(expression.group(1)) if expression else ''
+
+    # keep the requested formulas and (recursively) the formulas they refer to
+    kept = set()
+    todo = [i for i in keep if i in formulas]
+    while todo:
+        name = todo.pop()
+        if name not in kept:
+            kept.add(name)
+            todo.extend(i for i in formulas if f'[{i}]' in formulas[name])
+
+    # drop the other formulas
+    def replace(match):
+        name = FORMULA_NAME_PATTERN.search(match.group(0))
+        return match.group(0) if name and unescape(name.group(1)) in kept else ''
+    text = FORMULA_PATTERN.sub(replace, text)
+
+    # write the reduced model next to the target and move it in place
+    fd, path = tempfile.mkstemp(suffix='.lnr', dir=os.path.dirname(os.path.abspath(target)))
+    with os.fdopen(fd, 'w', encoding=MODEL_ENCODING, newline='') as fh:
+        fh.write(text)
+    os.replace(path, target)
@@ -0,0 +1,96 @@
+'''
+Durable journal of the completed runs of a sweep, so a sweep that is restarted only runs the remaining experiments.
+
+'''
+
+# import required packages
+import json, os, threading, time
+
+from linnyr_store import ResultStore #@UnresolvedImport
+from linnyr_stream import FileTail #@UnresolvedImport
+
+
+# define a class for the journal of a sweep
+class RunJournal:
+    '''
+    Journal of the runs of a sweep in a directory: one JSON line per run in
+    journal.jsonl (experiment id, sampled parameters, status, solver status
+    and outcome names) and the outcome arrays in a ResultStore in results/.
+
+    The arrays are written (and flushed to disk) before the line that
+    refers to them, and every line is written with a single append that is
+    flushed to disk too, so after a crash the journal only lists runs whose
+    arrays are complete. Several worker processes can share one journal;
+    each reads only the lines that have been added since its last read.
+    get returns the arrays of a completed run; failed runs are recorded
+    with their error and run again.
+
+    '''
+
+    # create an instance of this class
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.path = os.path.join(self.directory, 'journal.jsonl')
+        self.store = ResultStore(os.path.join(self.directory, 'results'), fsync=True)
+        self._tail = FileTail(self.path, encoding='utf-8')
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    # define a function for pickling the journal without the entries that have been read (each process reads them itself)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_tail'] = FileTail(self.path, encoding='utf-8')
+        state['_entries'] = {}
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # define a function for reading the lines that have been added to the journal since the last read (the last line of an experiment id counts)
+    def _update(self):
+        with self._lock:
+            for line in self._tail.read_lines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._entries[entry['experiment_id']] = entry
+        return self._entries
+
+    # define a function for getting the entries of all runs in the journal
+    def entries(self):
+        return self._update()
+
+    # define a function for getting the outcome arrays of a completed run (None if it has not been completed)
+    def get(self, experiment_id):
+        entry = self._entries.get(experiment_id)
+        if entry is None or entry['status'] != 'completed':
+
+            # another process may have completed it since the journal was read
+            entry = self._update().get(experiment_id)
+            if entry is None or entry['status'] != 'completed':
+                return None
+        handle = self.store.get(experiment_id, entry['outcomes'])
+        return None if handle is None else handle.load()
+
+    # define a function for appending a run to the journal
+    def record(self, experiment_id, parameters, results=None, solver_status=None, error=None):
+        if results is not None:
+            self.store.put(experiment_id, results)
+        entry = {'experiment_id':experiment_id, 'time':time.time(), 'pid':os.getpid(),
+                 'status':'failed' if error is not None else 'completed', 'solver_status':solver_status,
+                 'parameters':parameters, 'outcomes':list(results or []), 'error':error}
+
+        # append the line with a single write and flush it to disk
+        line = (json.dumps(entry, default=float) + '\n').encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        with self._lock:
+            self._entries[experiment_id] = entry
+        return entry
@@ -0,0 +1,126 @@
+'''
+Parser for the solver log (<model>_exp.log) of the Linny-R console and a sink for per-run telemetry.
+
+'''
+
+# import required packages
+import json, os, re
+
+# define the patterns for the lines of the log file (one block of periods starts with SET-UP and ends with 'Solution is')
+SETUP_PATTERN = re.compile(r'^SET-UP: (\d+) variables.*\((\d+) - (\d+)\)\s*$')
+SOLUTION_PATTERN = re.compile(r'^Solution is (\w+)(?:, objective = (\S+))?')
+PROBLEM_PATTERN = re.compile(r'^This problem is (infeasible|unbounded)', re.I)
+SIZE_PATTERN = re.compile(r'^Model size:\s+(\d+) constraints,\s+(\d+) variables,\s+(\d+) non-zeros')
+ITERATIONS_PATTERN = re.compile(r'^(?:Optimal|Feasible) solution\s+\S+ after\s+(\d+) iter,\s+(\d+) nodes \(gap ([\d.]+)%\)')
+REFACTORIZATIONS_PATTERN = re.compile(r'^There were (\d+) refactorizations')
+LOAD_PATTERN = re.compile(r'^Time to load data was ([\d.]+) seconds, presolve used ([\d.]+) seconds')
+SIMPLEX_PATTERN = re.compile(r'^\.\.\. ([\d.]+) seconds in simplex solver, in total ([\d.]+) seconds')
+
+
+# define a function for parsing the log lines of a Linny-R run into the metrics of each block of periods
+def parse_log_lines(lines):
+    '''
+    Parse the lines of a Linny-R log file into a list with a dict per block
+    of periods, holding start, end, variables, constraints, non_zeros,
+    iterations, nodes, gap (in %), refactorizations, load_time,
+    presolve_time, simplex_time, total_time (in seconds), status and
+    objective. Metrics that are not in the log are None.
+
+    '''
+
+    blocks = []
+    block = None
+    for line in lines:
+        line = line.strip()
+
+        # a new block of periods
+        match = SETUP_PATTERN.match(line)
+        if match:
+            block = dict.fromkeys(['constraints', 'non_zeros', 'iterations', 'nodes', 'gap', 'refactorizations',
+                                   'load_time', 'presolve_time', 'simplex_time', 'total_time', 'status', 'objective'])
+            block.update(start=int(match.group(2)), end=int(match.group(3)), variables=int(match.group(1)))
+            continue
+        if block is None:
+            continue
+
+        # the metrics of the solver for this block
+        if match := SIZE_PATTERN.match(line):
+            block.update(constraints=int(match.group(1)), variables=int(match.group(2)), non_zeros=int(match.group(3)))
+        elif match := ITERATIONS_PATTERN.match(line):
+            block.update(iterations=int(match.group(1)), nodes=int(match.group(2)), gap=float(match.group(3)))
+        elif match := REFACTORIZATIONS_PATTERN.match(line):
+            block['refactorizations'] = int(match.group(1))
+        elif match := LOAD_PATTERN.match(line):
+            block.update(load_time=float(match.group(1)), presolve_time=float(match.group(2)))
+        elif match := SIMPLEX_PATTERN.match(line):
+            block.update(simplex_time=float(match.group(1)), total_time=float(match.group(2)))
+
+        # the end of this block
+        elif (match := SOLUTION_PATTERN.match(line) or PROBLEM_PATTERN.match(line)):
+            block['status'] = match.group(1).lower()
+            if match.re is SOLUTION_PATTERN and match.group(2):
+                block['objective'] = float(match.group(2))
+            blocks.append(block)
+            block = None
+    return blocks
+
+
+# define a function for parsing a Linny-R log file
+def parse_log_file(path):
+    with open(path, encoding='iso-8859-1') as fh:
+        return parse_log_lines(fh)
+
+
+# define a function for summarizing the metrics of all blocks of a run
+def summarize_blocks(blocks):
+    '''
+    Summarize the blocks of a run: the number of blocks and of blocks that
+    are not optimal, the total iterations, refactorizations and solver
+    times, the largest gap and the status of the run.
+
+    '''
+
+    def total(name):
+        return sum(i[name] for i in blocks if i[name] is not None)
+
+    not_optimal = [i for i in blocks if i['status'] != 'optimal']
+    gaps = [i['gap'] for i in blocks if i['gap'] is not None]
+    return {'blocks':len(blocks),
+            'blocks_not_optimal':len(not_optimal),
+            'iterations':total('iterations'),
+            'refactorizations':total('refactorizations'),
+            'load_time':total('load_time'),
+            'presolve_time':total('presolve_time'),
+            'simplex_time':total('simplex_time'),
+            'max_gap':max(gaps) if gaps else None,
+            'status':not_optimal[0]['status'] if not_optimal else ('optimal' if blocks else None)}
+
+
+# define a class for writing the telemetry of each run to a JSON lines file
+class TelemetryLog:
+    '''
+    Appends the telemetry of each run as one JSON line to a file. Every
+    record is written with a single append, so several processes can share
+    one file.
+
+    '''
+
+    # create an instance of this class
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    # define a function for writing the telemetry of a run
+    def record(self, telemetry):
+        line = (json.dumps(telemetry, default=str) + '\n').encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    # define a function for reading all records
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as fh:
+            return [json.loads(i) for i in fh if i.strip()]
@@ -0,0 +1,262 @@
+'''
+Streaming reader for Linny-R model files (.lnr) with an index of the entities in the model.
+
+'''
+
+# import required packages
+import os, re, tempfile
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from xml.sax.saxutils import unescape
+
+# define the owner of entities that do not belong to an actor
+NO_ACTOR = '(no actor)'
+
+# define the collections in a model file and the kind of entity they contain
+COLLECTIONS = {'actors':'actor', 'processes':'process', 'products':'product', 'links':'link',
+               'datasets':'dataset', 'clusters':'cluster', 'formulas':'formula'}
+
+# define the attributes that experiments can set, per kind of entity
+INPUT_ATTRIBUTES = {'process':('LB', 'UB', 'IL'), 'product':('LB', 'UB', 'IL', 'Price')}
+
+# define the attributes that can be set by patching the model file (attribute -> element) for processes and products
+PATCHABLE_ATTRIBUTES = {'LB':'lower-bound', 'UB':'upper-bound', 'IL':'initial-stock'}
+
+# define the patterns for the processes and products in a model file and for their name, owner and bound elements
+ENTITY_PATTERN = re.compile(r'<(process|product)(?=[\s>])[^>]*>')
+NAME_PATTERN = re.compile(r'<name>(.*?)</name>', re.S)
+OWNER_PATTERN = re.compile(r'<owner>(.*?)</owner>', re.S)
+DECIMAL_COMMA_PATTERN = re.compile(r'<(?:upper-bound|lower-bound|relative-rate)>-?\d+,\d')
+
+# define an entity of a model: its kind, full name (as used in Linny-R variables), name, owner and simple attributes
+Entity = namedtuple('Entity', ['kind', 'full_name', 'name', 'owner', 'attributes'])
+
+
+# define a function for creating the full name of an entity (the name followed by the owner between brackets)
+def full_name(name, owner):
+    if not owner or owner == NO_ACTOR:
+        return name
+    return f'{name} ({owner})'
+
+
+# define a class for the index of a Linny-R model
+class LinnyRModelIndex:
+    '''
+    Index of the entities in a Linny-R model file, built with iterparse.
+
+    entities maps the full name of every actor, process, product, dataset
+    and cluster to an Entity (processes and products that belong to an
+    actor are named 'name (owner)'), formulas maps the names of the output
+    formulas to their expressions, and links holds the links as Entity
+    tuples named 'from -> to'. settings holds the top-level settings such
+    as start-period, end-period and look-ahead-period.
+
+    '''
+
+    # create an instance of this class by reading a model file
+    def __init__(self, path):
+        self.path = path
+        self.entities = {}
+        self.formulas = {}
+        self.links = []
+        self.settings = {}
+        self._read(path)
+
+    # define a function for reading the model file
+    def _read(self, path):
+        depth = 0
+        collection = None
+
+        # stream through the file and only keep the simple attributes of each entity
+        for event, element in ET.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == 2 and element.tag in COLLECTIONS:
+                    collection = element.tag
+                continue
+            depth -= 1
+
+            # store the top-level settings (elements without children)
+            if depth == 1:
+                if element.tag in COLLECTIONS:
+                    collection = None
+                elif len(element) == 0:
+                    self.settings[element.tag] = (element.text or '').strip()
+                element.clear()
+
+            # store each entity of a collection (clusters are nested, so they are stored at any depth)
+            elif collection is not None and element.tag == COLLECTIONS[collection] and (depth == 2 or element.tag == 'cluster'):
+                self._add(element)
+                if element.tag != 'cluster':
+                    element.clear()
+
+    # define a function for adding an entity to the index
+    def _add(self, element):
+        attributes = {i.tag:(i.text or '').strip() for i in element if len(i) == 0}
+        attributes.update(element.attrib)
+        kind = element.tag
+        name = attributes.get('name', '')
+        owner = attributes.get('owner', NO_ACTOR)
+
+        if kind == 'formula':
+            self.formulas[name] = attributes.get('expression', '')
+        elif kind == 'link':
+            source = full_name(attributes.get('from-name', ''), attributes.get('from-owner'))
+            target = full_name(attributes.get('to-name', ''), attributes.get('to-owner'))
+            self.links.append(Entity(kind, f'{source} -> {target}', f'{source} -> {target}', NO_ACTOR, attributes))
+        else:
+            name_with_owner = name if kind == 'actor' else full_name(name, owner)
+            self.entities[name_with_owner] = Entity(kind, name_with_owner, name, owner, attributes)
+
+    # define a function for finding an entity by its full name
+    def get(self, name):
+        return self.entities.get(name)
+
+    # define a function for listing the entities of one kind
+    def of_kind(self, kind):
+        return {k:v for k, v in self.entities.items() if v.kind == kind}
+
+    # define a function for checking Linny-R variable names ('entity:attribute') against the model
+    def unknown_variables(self, variables):
+        unknown = []
+        for variable in variables:
+            name, _, attribute = variable.rpartition(':')
+            entity = self.entities.get(name)
+
+            # the attribute must be one that can be set for the kind of entity (e.g. no price of a process)
+            if entity is None or attribute not in INPUT_ATTRIBUTES.get(entity.kind, ()):
+                unknown.append(variable)
+        return unknown
+
+    # define a function for checking whether a variable can be set by patching the model file instead of a scenario file
+    def is_patchable(self, variable):
+        entity, _, attribute = variable.rpartition(':')
+        element = PATCHABLE_ATTRIBUTES.get(attribute)
+        entity = self.entities.get(entity)
+        
+        # only constant bounds of processes and products (not bounds that are defined by a dataset)
+        if element is None or entity is None or entity.kind not in ('process', 'product'):
+            return False
+        return not entity.attributes.get(f'{element}-data')
+
+    # define a function for checking output formula names against the model
+    def unknown_formulas(self, names):
+        return [i for i in names if i not in self.formulas]
+
+
+# keep the indices that have been read, so each model file is only parsed once per modification
+_indices = {}
+
+
+# define a function for getting the (cached) index of a model file
+def load_model_index(path):
+    '''
+    Return the LinnyRModelIndex of a model file, reading it again only if
+    the modification time of the file has changed.
+
+    '''
+
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    cached = _indices.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, LinnyRModelIndex(path))
+        _indices[path] = cached
+    return cached[1]
+
+
+# define a function for formatting a number the way the model file does (Linny-R saves with the decimal separator of its locale)
+def _format_number(value, decimal_comma):
+    text = repr(float(value))
+    text = text[:-2] if text.endswith('.0') else text
+    return text.replace('.', ',') if decimal_comma else text
+
+
+# keep the text of the last model files that have been patched, by file (inode), so each policy or window of a model is read once
+_texts = {}
+
+
+# define a function for finding the processes and products in the text of a model file: {full name: (start, end)}
+def _entity_spans(text):
+    spans = {}
+    for match in ENTITY_PATTERN.finditer(text):
+        end = text.find(f'</{match.group(1)}>', match.end())
+        if end < 0:
+            continue
+        end += len(match.group(1)) + 3
+        name = NAME_PATTERN.search(text, match.end(), end)
+        owner = OWNER_PATTERN.search(text, match.end(), end)
+        spans[full_name(unescape(name.group(1)) if name else '', unescape(owner.group(1)) if owner else None)] = (match.start(), end)
+    return spans
+
+
+# define a function for reading the text of a model file and the spans of its entities, again only if it has been modified
+def _read_model_text(path):
+    stat = os.stat(path)
+    key = (stat.st_dev, stat.st_ino)
+    cached = _texts.pop(key, None)
+    if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+        with open(path, encoding='iso-8859-1', newline='') as fh:
+            text = fh.read()
+        cached = ((stat.st_mtime_ns, stat.st_size), text, _entity_spans(text))
+
+    # keep the most recently used texts only
+    _texts[key] = cached
+    while len(_texts) > 4:
+        del _texts[next(iter(_texts))]
+    return cached[1], cached[2]
+
+
+# define a function for writing a copy of a model file with other constant bounds
+def patch_model(source, target, settings, model_settings=None):
+    '''
+    Write a copy of the model file source to target in which the constant
+    bounds of processes and products are replaced, and return target.
+
+    settings maps Linny-R variables ('entity:LB', 'entity:UB' or the
+    initial level 'product:IL') to numbers; check them with
+    LinnyRModelIndex.is_patchable first. model_settings maps top-level
+    settings (e.g. 'end-period') to new values. The rest of the file is
+    copied byte for byte and target is replaced atomically.
+
+    '''
+
+    # read the model file (latin-1 round-trips every byte unchanged)
+    text, spans = _read_model_text(source)
+    decimal_comma = DECIMAL_COMMA_PATTERN.search(text) is not None
+
+    # collect the new bounds per entity
+    patches = {}
+    for variable, value in settings.items():
+        entity, _, attribute = variable.rpartition(':')
+        patches.setdefault(entity, {})[PATCHABLE_ATTRIBUTES[attribute]] = _format_number(value, decimal_comma)
+
+    # replace the elements of the entities that are patched (only their blocks are searched, the rest is copied)
+    missing = sorted(i for i in patches if i not in spans)
+    if missing:
+        raise ValueError(f'entities {missing} not found in {source}')
+    pieces = []
+    position = 0
+    for entity in sorted(patches, key=lambda i: spans[i][0]):
+        start, end = spans[entity]
+        block = text[start:end]
+        for element, value in patches[entity].items():
+            block, n = re.subn(f'<{element}>[^<]*</{element}>|<{element} />', lambda _: f'<{element}>{value}</{element}>', block, count=1)
+            if n == 0:
+                raise ValueError(f'{entity} has no {element} in {source}')
+        pieces += [text[position:start], block]
+        position = end
+    text = ''.join(pieces) + text[position:]
+
+    # replace the top-level settings (the first element with their name, before the entities)
+    for element, value in (model_settings or {}).items():
+        text, n = re.subn(f'<{element}>[^<]*</{element}>', f'<{element}>{value}</{element}>', text, count=1)
+        if n == 0:
+            raise ValueError(f'{source} has no setting {element}')
+
+    # write the patched model next to the target and move it in place
+    fd, path = tempfile.mkstemp(suffix='.lnr', dir=os.path.dirname(os.path.abspath(target)))
+    with os.fdopen(fd, 'w', encoding='iso-8859-1', newline='') as fh:
+        fh.write(text)
+    os.replace(path, target)
+    return target
@@ -0,0 +1,176 @@
+'''
+Asyncio runner that solves many experiments with concurrent Linny-R console (lrc) processes.
+
+'''
+
+# import required packages
+import asyncio, os, signal, subprocess, threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+# define a function for killing a Linny-R console process (its whole process group on POSIX, so wrappers are killed too)
+def kill_process(process):
+    if process.poll() is None:
+        if os.name == 'posix':
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        else:
+            process.kill()
+        process.wait()
+
+
+# define a class for running experiments of a Linny-R model concurrently from one Python process
+class AsyncLinnyRRunner:
+    '''
+    Runs experiments of a BaseLinnyRModel with at most max_concurrency lrc
+    processes at the same time.
+
+    Every run uses its own scratch directory of the model and is solved
+    like BaseLinnyRModel.run_experiment does, in a worker thread, so the
+    event loop keeps the solvers busy. A run of a model with n_windows > 1
+    uses a process per window, and each of them counts against
+    max_concurrency. Each lrc process may take at most timeout
+    seconds (the timeout of the model by default); all of them are killed
+    when the runs are cancelled.
+
+    '''
+
+    # create an instance of this class
+    def __init__(self, model, max_concurrency=None, timeout=None):
+        self.model = model
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.timeout = timeout if timeout is not None else model.timeout
+
+    # define a function for checking the variable names of all experiments against the model file
+    def _check_names(self, experiments):
+        unknown = self.model.model_index.unknown_variables(sorted(set().union(*experiments)))
+        if unknown:
+            raise ValueError(f'invalid experiments for {self.model.model_file}: unknown variables {unknown}')
+
+    # define a function for preparing and checking one experiment (just before it is run, so only the running ones are in memory)
+    def _prepare(self, experiment):
+        experiment = self.model.prepare_experiment(experiment)
+        if self.model.check_experiments:
+            self.model.validate_experiments([experiment])
+        return experiment
+
+    # define a function for running the Linny-R console in a worker thread (it is killed when the runs are cancelled)
+    def _run_lrc(self, command, cwd, timeout):
+
+        # wait for room for another process (the windows of a run each need one)
+        while not self._slots.acquire(timeout=0.1):
+            if self._stopped.is_set():
+                raise asyncio.CancelledError()
+        try:
+            if self._stopped.is_set():
+                raise asyncio.CancelledError()
+            process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                       start_new_session=(os.name == 'posix'))
+            self._processes.add(process)
+            try:
+
+                # the timeout of the runner applies instead of that of the model
+                return process.wait(self.timeout)
+            finally:
+                self._processes.discard(process)
+                kill_process(process)
+        finally:
+            self._slots.release()
+
+    # define a function for running one experiment, bounded by the semaphore
+    async def _run_one(self, experiment, parameters, semaphore, executor):
+        async with semaphore:
+            return await self._run_prepared(await asyncio.to_thread(self._prepare, experiment), parameters, executor)
+
+    # define a function for running one prepared experiment (or taking its results from the journal, the store or the cache)
+    async def _run_prepared(self, experiment, parameters, executor):
+        model = self.model
+
+        # return the results of an earlier run of a sweep that has been restarted
+        key = None
+        if model.cache is not None or model.result_store is not None or model.journal is not None:
+            key = await asyncio.to_thread(model._cache_key, experiment)
+        if model.journal is not None:
+            results = await asyncio.to_thread(model.journal.get, key)
+            if results is not None:
+                return results if model.result_store is None else await asyncio.to_thread(model.result_store.put, key, results)
+
+        # return the stored results if there are any
+        columns = model._output_columns()
+        if model.result_store is not None and columns is not None:
+            handle = await asyncio.to_thread(model.result_store.get, key, columns)
+            if handle is not None:
+                return handle
+        if model.cache is not None:
+            results = await asyncio.to_thread(model.cache.get, key)
+            if results is not None:
+                return results if model.result_store is None else await asyncio.to_thread(model.result_store.put, key, results)
+
+        # solve the experiment in a thread of the executor
+        try:
+            results, status = await asyncio.get_running_loop().run_in_executor(executor, model._solve, experiment, self._run_lrc)
+        except Exception as e:
+            if model.journal is not None:
+                await asyncio.to_thread(model.journal.record, key, parameters, error=repr(e))
+            raise
+
+        # record the run in the journal
+        if model.journal is not None:
+            await asyncio.to_thread(model.journal.record, key, parameters, results, status)
+
+        # store the results in the cache
+        if model.cache is not None:
+            await asyncio.to_thread(model.cache.put, key, results)
+        
+        # write the arrays to the result store and return a handle to them
+        if model.result_store is not None:
+            results = await asyncio.to_thread(model.result_store.put, key, results)
+        return results
+
+    # define a function for running experiments concurrently (in the running event loop)
+    async def run_experiments_async(self, experiments, return_exceptions=False):
+        '''
+        Run the experiments and return their results in the same order.
+
+        Every experiment is expanded into its time series (and checked)
+        only when its run starts. With return_exceptions, a failed run (e.g.
+        a timeout) gives its exception instead of results; otherwise the
+        first failure cancels the remaining runs and is raised.
+
+        '''
+
+        # keep the sampled values for the journal and check the variable names once before any run is started
+        experiments = list(experiments)
+        parameters = [{k:v for k, v in i.items() if np.ndim(v) == 0} for i in experiments]
+        if self.model.check_experiments and experiments:
+            await asyncio.to_thread(self._check_names, experiments)
+
+        # run the solvers in threads of their own (the default executor of asyncio may have fewer threads)
+        self._processes = set()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._stopped = threading.Event()
+        executor = ThreadPoolExecutor(self.max_concurrency)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.ensure_future(self._run_one(i, p, semaphore, executor)) for i, p in zip(experiments, parameters)]
+        try:
+            return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+        # cancel the remaining runs and kill their processes after a failure or a cancellation
+        finally:
+            self._stopped.set()
+            for task in tasks:
+                task.cancel()
+            for process in list(self._processes):
+                kill_process(process)
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            # wait until the threads have removed their scratch directories
+            await asyncio.to_thread(executor.shutdown)
+
+    # define a function for running experiments concurrently (from synchronous code)
+    def run_experiments(self, experiments, return_exceptions=False):
+        return asyncio.run(self.run_experiments_async(experiments, return_exceptions))
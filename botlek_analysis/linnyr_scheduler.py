@@ -0,0 +1,109 @@
+'''
+Scheduler that runs the experiments of a Linny-R model grouped by policy, so every policy is set up once per worker.
+
+'''
+
+# import required packages
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from linnyr_cache import hash_experiment #@UnresolvedImport
+
+# keep the model of a worker process (set once by the initializer, so it is only unpickled once per worker)
+_model = None
+
+
+# define a function for storing the model in a worker process
+def _initialize(model):
+    global _model
+    _model = model
+
+
+# define a function for running the policy groups that have been assigned to a worker
+def _run_groups(groups, batch_size, model=None):
+    model = model or _model
+    results = []
+
+    # run the experiments of each policy together (one model variant and one scratch directory per batch)
+    for indices, experiments in groups:
+        results.extend(zip(indices, model.run_experiments(experiments, batch_size)))
+    return results
+
+
+# define a class for running experiments grouped by policy
+class PolicyScheduler:
+    '''
+    Runs experiments of a BaseLinnyRModel on n_processes worker processes,
+    with all experiments of a policy (a combination of lever values) on the
+    same worker.
+
+    Each worker gets its share of the policies at once and solves the
+    experiments of a policy with model.run_experiments, so the per-policy
+    model variant (see patch_scalar_levers) is built once and up to
+    batch_size experiments share one scratch directory and one lrc run.
+    The model itself, with its reference data, is sent to each worker only
+    once. The policies are spread over the workers by their number of
+    experiments (largest first); a policy with more experiments than the
+    share of a worker is split over several workers, so fewer policies
+    than workers still keep all workers busy.
+
+    '''
+
+    # create an instance of this class
+    def __init__(self, model, n_processes=None, batch_size=100):
+        self.model = model
+        self.n_processes = n_processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+
+    # define a function for finding the policy of an experiment (the values of its levers)
+    def policy_key(self, experiment):
+        variables = {v for lever in self.model.levers for v in lever.variable_name}
+        return hash_experiment({k:v for k, v in experiment.items() if k in variables})
+
+    # define a function for grouping experiments by policy and assigning the groups to the workers
+    def assign(self, experiments):
+        groups = {}
+        for i, experiment in enumerate(experiments):
+            indices, members = groups.setdefault(self.policy_key(experiment), ([], []))
+            indices.append(i)
+            members.append(experiment)
+
+        # split the policies with more experiments than the share of a worker, so every worker gets experiments
+        n_workers = min(self.n_processes, len(experiments))
+        share = -(-len(experiments) // n_workers) if n_workers else 0
+        chunks = []
+        for key, (indices, members) in groups.items():
+            size = -(-len(indices) // -(-len(indices) // share))
+            chunks.extend((key, indices[i:i + size], members[i:i + size]) for i in range(0, len(indices), size))
+
+        # give the largest remaining chunk to the worker with the fewest experiments (chunks of a policy on the same worker are run together)
+        workers = [{} for _ in range(n_workers)]
+        loads = [0] * n_workers
+        for key, indices, members in sorted(chunks, key=lambda c: len(c[1]), reverse=True):
+            worker = loads.index(min(loads))
+            group = workers[worker].setdefault(key, ([], []))
+            group[0].extend(indices)
+            group[1].extend(members)
+            loads[worker] += len(indices)
+        return [list(i.values()) for i in workers if i]
+
+    # define a function for running experiments and returning their results in the same order
+    def run_experiments(self, experiments):
+        experiments = list(experiments)
+        results = [None] * len(experiments)
+        workers = self.assign(experiments)
+
+        # run in this process if there is only one worker
+        if len(workers) <= 1:
+            for worker in workers:
+                for i, result in _run_groups(worker, self.batch_size, self.model):
+                    results[i] = result
+            return results
+
+        # otherwise send each worker its policies in a single task
+        with ProcessPoolExecutor(len(workers), initializer=_initialize, initargs=(self.model,)) as executor:
+            futures = [executor.submit(_run_groups, worker, self.batch_size) for worker in workers]
+            for future in futures:
+                for i, result in future.result():
+                    results[i] = result
+        return results
@@ -0,0 +1,125 @@
+'''
+Append-only columnar store for the outcome arrays of Linny-R runs, with lightweight handles to the stored results.
+
+'''
+
+# import required packages
+import os, tempfile
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+
+# define a class for a reference to the stored results of one run
+class ResultHandle:
+    '''
+    Reference to the results of one run in a ResultStore.
+
+    Holds only the directory of the store, the id of the run and the names
+    of its outcomes, so it is cheap to keep and to send between processes.
+    handle[name] memory-maps the array of an outcome and handle.load()
+    returns all of them as a dict, like the connector does without a store.
+
+    '''
+
+    # create an instance of this class
+    def __init__(self, directory, experiment_id, names):
+        self.directory = directory
+        self.experiment_id = experiment_id
+        self.names = list(names)
+
+    # define a function for finding the shard of an outcome
+    def path(self, name):
+        return os.path.join(self.directory, quote(name, safe=''), f'{self.experiment_id}.npy')
+
+    # define a function for memory-mapping the array of an outcome
+    def __getitem__(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        return np.load(self.path(name), mmap_mode='r')
+
+    # define a function for loading the arrays of all outcomes
+    def load(self):
+        return {name:np.load(self.path(name)) for name in self.names}
+
+    def __repr__(self):
+        return f'ResultHandle({self.experiment_id!r}, {self.names!r})'
+
+
+# define a class for storing the outcome arrays of runs on disk
+class ResultStore:
+    '''
+    Stores the outcome arrays of runs as one .npy shard per outcome and run,
+    in a directory per outcome (directory/<outcome>/<experiment id>.npy).
+
+    Shards are written atomically and never rewritten, so several processes
+    can append to one store. put returns a ResultHandle instead of the
+    arrays, and stack combines an outcome of many runs into one matrix
+    (optionally a memory-mapped .npy file), reading one shard at a time.
+    With fsync, every shard is flushed to disk before it is moved in place.
+
+    '''
+
+    # create an instance of this class
+    def __init__(self, directory, fsync=False):
+        self.directory = os.path.abspath(directory)
+        self.fsync = fsync
+        os.makedirs(self.directory, exist_ok=True)
+
+    # define a function for storing the results of a run and returning a handle to them
+    def put(self, experiment_id, results):
+        handle = ResultHandle(self.directory, experiment_id, results.keys())
+        for name, values in results.items():
+            path = handle.path(name)
+
+            # the results of an experiment id are final, so existing shards are kept
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # write the shard to a temporary file and move it in place
+            fd, temporary = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as fh:
+                np.save(fh, np.asarray(values, dtype=np.float64))
+                if self.fsync:
+                    fh.flush()
+                    os.fsync(fh.fileno())
+            os.replace(temporary, path)
+        return handle
+
+    # define a function for getting a handle to stored results (None if the run is not in the store)
+    def get(self, experiment_id, names):
+        handle = ResultHandle(self.directory, experiment_id, names)
+        if not all(os.path.exists(handle.path(i)) for i in handle.names):
+            return None
+        return handle
+
+    # define a function for listing the outcomes in the store
+    def outcomes(self):
+        return sorted(unquote(i.name) for i in os.scandir(self.directory) if i.is_dir())
+
+    # define a function for listing the experiment ids that have results for an outcome
+    def experiment_ids(self, name):
+        directory = os.path.join(self.directory, quote(name, safe=''))
+        if not os.path.isdir(directory):
+            return []
+        return sorted(i.name[:-4] for i in os.scandir(directory) if i.name.endswith('.npy'))
+
+    # define a function for combining an outcome of several runs into one matrix (a row per run)
+    def stack(self, name, handles, path=None):
+        handles = list(handles)
+        if not handles:
+            return np.empty((0, 0))
+        first = handles[0][name]
+
+        # allocate the matrix in memory or as a .npy file that is filled row by row
+        shape = (len(handles), len(first))
+        if path is None:
+            matrix = np.empty(shape, dtype=np.float64)
+        else:
+            matrix = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=shape)
+        for i, handle in enumerate(handles):
+            matrix[i] = handle[name]
+        if path is not None:
+            matrix.flush()
+        return matrix
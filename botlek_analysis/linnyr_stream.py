@@ -0,0 +1,112 @@
+'''
+Incremental reading of the output and log files that the Linny-R console (lrc) writes while it is solving.
+
+'''
+
+# import required packages
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from linnyr_io import DELIMITER #@UnresolvedImport
+from linnyr_log import PROBLEM_PATTERN, SETUP_PATTERN, SOLUTION_PATTERN #@UnresolvedImport
+
+# define the solver status of a block of periods
+Block = namedtuple('Block', ['start', 'end', 'status', 'objective'])
+
+
+# define an exception for a run that Linny-R cannot solve
+class LinnyRInfeasibleError(RuntimeError):
+    pass
+
+
+# define a class for reading the lines that have been added to a file since the last read
+class FileTail:
+
+    # create an instance of this class
+    def __init__(self, path, encoding='iso-8859-1'):
+        self.path = path
+        self.encoding = encoding
+        self._position = 0
+        self._partial = ''
+
+    # define a function for reading the complete lines that have been added (an incomplete last line is kept for later)
+    def read_lines(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding=self.encoding, newline='') as fh:
+            fh.seek(self._position)
+            text = fh.read()
+            self._position = fh.tell()
+        lines = (self._partial + text).splitlines(keepends=True)
+        self._partial = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        return [i.rstrip('\r\n') for i in lines]
+
+    # define a function for reading the incomplete last line (only useful once the file is complete)
+    def flush(self):
+        partial, self._partial = self._partial, ''
+        return [partial] if partial else []
+
+
+# define a class for following the solver status of each block of periods in the log file
+class LogTail(FileTail):
+
+    # create an instance of this class
+    def __init__(self, path):
+        super().__init__(path)
+        self._block = None
+
+    # define a function for reading the blocks that have been finished since the last read
+    def read_blocks(self, final=False):
+        blocks = []
+        for line in self.read_lines() + (self.flush() if final else []):
+            setup = SETUP_PATTERN.match(line)
+            solution = SOLUTION_PATTERN.match(line)
+            problem = PROBLEM_PATTERN.match(line)
+            if setup:
+                self._block = (int(setup.group(2)), int(setup.group(3)))
+            elif (solution or problem) and self._block is not None:
+                status = (solution or problem).group(1).lower()
+                objective = float(solution.group(2)) if solution and solution.group(2) else None
+                blocks.append(Block(*self._block, status, objective))
+                self._block = None
+        return blocks
+
+
+# define a class for reading the rows of the output file that have been written since the last read
+class OutputTail(FileTail):
+
+    # create an instance of this class
+    def __init__(self, path, columns=None):
+        super().__init__(path)
+        self.columns = columns
+        self._names = None
+        self._indices = None
+        self._chunks = []
+
+    # define a function for reading the new rows as a dict of arrays (None if there are no new rows)
+    def read_chunk(self, final=False):
+        lines = self.read_lines() + (self.flush() if final else [])
+
+        # the first line holds the names of the output formulas
+        if self._names is None and lines:
+            names = [i.strip('"') for i in lines.pop(0).split(DELIMITER)]
+            wanted = names[1:] if self.columns is None else [i for i in names if i in self.columns]
+            self._names = wanted
+            self._indices = [names.index(i) for i in wanted]
+        lines = [i for i in lines if i]
+        if not lines:
+            return None
+
+        # parse the new rows at once (Linny-R may use a decimal comma, the delimiter is ';')
+        lines = [i.replace(',', '.') for i in lines]
+        values = np.loadtxt(lines, delimiter=DELIMITER, usecols=self._indices, ndmin=2, dtype=np.float64)
+        chunk = {name:values[:, i] for i, name in enumerate(self._names)}
+        self._chunks.append(chunk)
+        return chunk
+
+    # define a function for combining all chunks that have been read into the results of the run
+    def results(self):
+        return {name:np.concatenate([i[name] for i in self._chunks]) if self._chunks else np.empty(0)
+                for name in (self._names or [])}
@@ -0,0 +1,122 @@
+'''
+Trajectory generators that turn a sampled value into a time series for the scenario file of a Linny-R model.
+
+'''
+
+# import required packages
+import hashlib
+
+import numpy as np
+
+
+# define a base class for trajectory generators
+class Trajectory:
+    '''
+    Base class of the trajectory generators.
+
+    Calling a generator with a sampled value and a model returns a float64
+    array of model.time_steps + 1 values (Linny-R reads the first value as
+    the default). Trajectories are generated for every run: even a 10-year
+    series takes well under a millisecond, next to seconds for lrc.
+    Subclasses implement _generate and define their parameters in _key.
+
+    '''
+
+    # define the parameters that identify the trajectories of this generator
+    def _key(self):
+        return ()
+
+    # define a function for generating the trajectory of a value (see subclasses)
+    def _generate(self, value, model):
+        raise NotImplementedError
+
+    # define a function for getting the trajectory of a value
+    def __call__(self, value, model):
+        return np.asarray(self._generate(float(value), model), dtype=np.float64)
+
+    def __repr__(self):
+        return f'{type(self).__name__}{self._key()!r}'
+
+
+# define a generator for a linear trajectory from the current value to the sampled value at the end of the horizon
+class Linear(Trajectory):
+
+    # create an instance of this class
+    def __init__(self, current):
+        self.current = current
+
+    def _key(self):
+        return (self.current,)
+
+    def _generate(self, value, model):
+        gradient = (value - self.current) / model.time_steps
+        return np.arange(model.time_steps + 1, dtype=np.float64) * gradient + self.current
+
+
+# define a generator for a trajectory that goes from the current value to the sampled value in equal steps
+class Stepped(Trajectory):
+
+    # create an instance of this class (the horizon is split into n_steps periods of constant value)
+    def __init__(self, current, n_steps):
+        self.current = current
+        self.n_steps = n_steps
+
+    def _key(self):
+        return (self.current, self.n_steps)
+
+    def _generate(self, value, model):
+        period = np.minimum(np.arange(model.time_steps + 1) * self.n_steps // (model.time_steps + 1), self.n_steps - 1)
+        levels = np.linspace(self.current, value, self.n_steps) if self.n_steps > 1 else np.array([value])
+        return levels[period]
+
+
+# define a generator for a trajectory with a constant growth rate from the current value to the sampled value
+class Exponential(Trajectory):
+
+    # create an instance of this class (the current value and the sampled values must be positive)
+    def __init__(self, current):
+        if current <= 0:
+            raise ValueError(f'an exponential trajectory needs a positive current value, not {current}')
+        self.current = current
+
+    def _key(self):
+        return (self.current,)
+
+    def _generate(self, value, model):
+        if value <= 0:
+            raise ValueError(f'an exponential trajectory needs a positive value, not {value}')
+        fraction = np.arange(model.time_steps + 1, dtype=np.float64) / model.time_steps
+        return self.current * (value / self.current) ** fraction
+
+
+# define a generator for a reference time series of the model, scaled by the sampled factor
+class ScaledReference(Trajectory):
+
+    # create an instance of this class (name is the key of the series in model.reference_time_series)
+    def __init__(self, name):
+        self.name = name
+
+    def _key(self):
+        return (self.name,)
+
+    def _generate(self, value, model):
+        return model.reference_time_series[self.name] * value
+
+
+# define a generator for a recurring profile (e.g. a day or a year of quarters), scaled by the sampled factor
+class SeasonalProfile(Trajectory):
+
+    # create an instance of this class (the profile is repeated over the horizon, starting at its first value)
+    def __init__(self, profile):
+        self.profile = np.array(profile, dtype=np.float64)
+        self._digest = hashlib.sha256(self.profile.tobytes()).hexdigest()[:16]
+
+    def _key(self):
+        return (len(self.profile), self._digest)
+
+    def _generate(self, value, model):
+        n = model.time_steps
+        values = np.tile(self.profile, -(-n // len(self.profile)))[:n]
+
+        # insert the first number as a default value at the beginning of the array (for Linny-R specific input)
+        return np.concatenate((values[:1], values)) * value
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+'''
+Stand-in for the Linny-R console (lrc.exe) for benchmarks on Linux.
+
+Usage is the same as lrc: fake_lrc.py <model> <scenario file> [<scenario file> ...].
+For each scenario file it writes <model>_<scenario>.csv with a column per
+output formula of <model>.lnr, and a <model>_<scenario>.log and .lp that look
+like those of lrc. It is configured with environment variables:
+
+    LRC_FAKE_PERIODS           number of periods (default: end-period - start-period + 1 of the model, like lrc)
+    LRC_FAKE_SOLVE_TIME        seconds to sleep per scenario, to mimic the solver (default 0)
+    LRC_FAKE_BLOCK_LENGTH      periods per block in the log (default 96)
+    LRC_FAKE_INFEASIBLE_BLOCK  number of a block that is reported as infeasible (default none)
+
+'''
+
+# import required packages
+import hashlib, os, shutil, sys, tempfile, time
+
+import numpy as np
+
+# make the connector modules importable (they are in the parent directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from linnyr_io import write_scenario_file #@UnresolvedImport
+from linnyr_model import LinnyRModelIndex #@UnresolvedImport
+
+# define the log of one block of periods (copied from a log of lrc for the Botlek model)
+BLOCK_LOG = '''SET-UP: 377 variables (133 processes, 242 slack, 0 thresholds, 0 startup-related) ({start} - {end})
+ - scaled by factor 1050
+Model name:  '' - run #1
+Objective:   Maximize(R0)
+
+SUBMITTED
+Model size:      244 constraints,     377 variables,          896 non-zeros.
+Sets:                                   0 GUB,                  0 SOS.
+
+Optimal solution       18.9994793496 after        154 iter,         0 nodes (gap 0.0%).
+
+There were 4 refactorizations, 0 triggered by time and 1 by density.
+Time to load data was 0.000 seconds, presolve used 0.000 seconds,
+... 0.001 seconds in simplex solver, in total 0.001 seconds.
+Solution is {status}, objective = 1.900E+01 (EUR 19949)
+'''
+
+
+# define a function for finding the number of periods lrc solves for a model (one output row per period)
+def count_periods(index):
+    return int(index.settings['end-period']) - int(index.settings['start-period']) + 1
+
+
+# define a function for writing an output file (generated once per number of periods and set of formulas, then copied)
+def write_output(path, formulas, periods):
+    key = hashlib.sha256(repr((periods, formulas)).encode()).hexdigest()[:16]
+    cached = os.path.join(tempfile.gettempdir(), f'fake_lrc_{key}.csv')
+    if not os.path.exists(cached):
+        rng = np.random.default_rng(periods)
+        output = {'T':np.arange(1, periods + 1)}
+        output.update({name:np.round(np.cumsum(rng.normal(0, 1, periods)) + 1000, 2) for name in formulas})
+        fd, temporary = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        write_scenario_file(temporary, output)
+        os.replace(temporary, cached)
+    shutil.copyfile(cached, path)
+
+
+# define a function for writing a log file with one block per block_length periods
+def write_log(path, model, scenario, formulas, periods):
+    block_length = int(os.environ.get('LRC_FAKE_BLOCK_LENGTH', 96))
+    infeasible = int(os.environ.get('LRC_FAKE_INFEASIBLE_BLOCK', 0))
+    with open(path, 'w') as fh:
+        fh.write(f'Linny-R model file: {model}\nLinny-R scenario file(s): {scenario}\nOutput formulas:\n')
+        fh.write(''.join(f'- {i}\n' for i in formulas))
+        for number, start in enumerate(range(1, periods + 1, block_length), 1):
+            status = 'infeasible' if number == infeasible else 'optimal'
+            fh.write(BLOCK_LOG.format(start=start, end=min(start + block_length - 1, periods), status=status))
+            fh.flush()
+        fh.write('Terminated without errors -- deleting error file for this run.\n')
+
+
+if __name__ == '__main__':
+    model, scenarios = sys.argv[1], sys.argv[2:]
+    index = LinnyRModelIndex(f'{model}.lnr')
+    formulas = list(index.formulas)
+    periods = int(os.environ.get('LRC_FAKE_PERIODS', 0)) or count_periods(index)
+    solve_time = float(os.environ.get('LRC_FAKE_SOLVE_TIME', 0))
+
+    # solve each scenario file
+    for scenario in scenarios:
+        stem = f'{model}_{os.path.splitext(scenario)[0]}'
+        time.sleep(solve_time)
+        with open(f'{stem}.lp', 'w') as fh:
+            fh.write('/* Variable names:\nC1 = SMR (Air Liquide) (T=1)\n*/\nmax: ;\n')
+        write_log(f'{stem}.log', model, scenario, formulas, periods)
+        write_output(f'{stem}.csv', formulas, periods)
@@ -0,0 +1,73 @@
+'''
+Fixtures for the tests of the Linny-R connector, which run against the fake Linny-R console (software/fake_lrc.py).
+
+'''
+
+# import required packages
+import os, subprocess, sys
+
+import pytest
+
+# make the connector modules importable (they are in the parent directory)
+DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIRECTORY)
+
+from ema_workbench import RealParameter, TimeSeriesOutcome
+from linnyr_connector import LinnyRModel #@UnresolvedImport
+from linnyr_model import patch_model #@UnresolvedImport
+
+# define the path of the fake Linny-R console and of the model it runs
+FAKE_LRC = os.path.join(DIRECTORY, 'software', 'fake_lrc.py')
+MODEL = os.path.join(DIRECTORY, 'model', 'botlek_model.lnr')
+
+# define the number of periods of the model in the tests (two blocks of a day)
+PERIODS = 192
+
+
+# define a function for creating experiments (variable name -> value) for the model of the fake_model fixture
+def create_experiments(n):
+    return [{'E day-ahead:Price':5.0 + i, 'natural gas market:Price':0.28} for i in range(n)]
+
+
+# define a function for listing the scratch directories that are left in the working directory of a model
+def scratch_directories(model):
+    return [i for i in os.listdir(model.working_directory) if i.startswith('run_')]
+
+
+# define a function for creating a copy of the Botlek model in directory, run by the fake Linny-R console
+def create_fake_model(directory, model_class=LinnyRModel):
+    os.makedirs(directory, exist_ok=True)
+    patch_model(MODEL, os.path.join(directory, 'botlek_model.lnr'), {}, {'start-period':1, 'end-period':PERIODS})
+    model = model_class(name='BotlekModel', wd=str(directory), model_file='botlek_model.lnr')
+    model.linnyr = FAKE_LRC
+    model.uncertainties = [RealParameter(name='Electricity price', variable_name='E day-ahead:Price',
+                                         lower_bound=5.0, upper_bound=20.0),
+                           RealParameter(name='Gas price', variable_name='natural gas market:Price',
+                                         lower_bound=0.1, upper_bound=0.5)]
+    model.outcomes = [TimeSeriesOutcome(name='CF total', variable_name='CF total')]
+    return model
+
+
+# define a fixture with a copy of the Botlek model, run by the fake Linny-R console
+@pytest.fixture
+def fake_model(tmp_path, monkeypatch):
+
+    # the fake console solves instantly unless a test sets LRC_FAKE_SOLVE_TIME
+    monkeypatch.delenv('LRC_FAKE_SOLVE_TIME', raising=False)
+    monkeypatch.delenv('LRC_FAKE_PERIODS', raising=False)
+    return create_fake_model(str(tmp_path / 'model'))
+
+
+# define a fixture that keeps every process that is started (to check that they have been killed)
+@pytest.fixture
+def started(monkeypatch):
+    processes = []
+
+    # define a Popen that remembers its processes
+    class RecordingPopen(subprocess.Popen):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            processes.append(self)
+
+    monkeypatch.setattr(subprocess, 'Popen', RecordingPopen)
+    return processes
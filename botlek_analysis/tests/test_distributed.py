@@ -0,0 +1,125 @@
+'''
+Tests of the coordinator and the workers (linnyr_distributed), with two local worker processes and the fake Linny-R console.
+
+'''
+
+# import required packages
+import multiprocessing, signal, threading, time
+
+import numpy as np
+import pytest
+
+from conftest import PERIODS, create_experiments, create_fake_model #@UnresolvedImport
+from linnyr_connector import LinnyRModel #@UnresolvedImport
+from linnyr_distributed import LinnyRCoordinator, LinnyRWorker, LinnyRWorkerError #@UnresolvedImport
+
+# define the authkey of the coordinator and the workers in the tests
+AUTHKEY = b'test'
+
+
+# define a model that also returns the electricity price of the experiment, so the results of experiments can be told apart
+class TaggedModel(LinnyRModel):
+
+    def run_experiment(self, experiment):
+        results = super().run_experiment(experiment)
+        results['price'] = np.array([experiment['E day-ahead:Price']])
+        return results
+
+
+# define a fixture with a tagged copy of the Botlek model (the fake console takes 1 s per run unless a test changes it)
+@pytest.fixture
+def tagged_model(tmp_path, monkeypatch):
+    monkeypatch.setenv('LRC_FAKE_SOLVE_TIME', '1')
+    monkeypatch.delenv('LRC_FAKE_PERIODS', raising=False)
+    return create_fake_model(str(tmp_path / 'model'), TaggedModel)
+
+
+# define a fixture for starting worker processes that connect to a coordinator (they are killed after the test)
+@pytest.fixture
+def start_workers():
+    processes = []
+
+    def start(coordinator, n):
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=LinnyRWorker(coordinator.address, AUTHKEY).run, daemon=True) for _ in range(n)]
+        for worker in workers:
+            worker.start()
+        processes.extend(workers)
+        return workers
+
+    yield start
+    for process in processes:
+        process.kill()
+        process.join()
+
+
+# define a function for checking the results of experiments (one result per experiment, in the same order)
+def assert_results(results, experiments):
+    assert [len(i['CF total']) for i in results] == [PERIODS] * len(experiments)
+    assert [i['price'][0] for i in results] == [i['E day-ahead:Price'] for i in experiments]
+
+
+def test_results_of_two_workers(tagged_model, start_workers):
+    experiments = create_experiments(4)
+    with LinnyRCoordinator(tagged_model, authkey=AUTHKEY) as coordinator:
+        start_workers(coordinator, 2)
+        assert_results(coordinator.run_experiments(experiments), experiments)
+
+
+def test_lost_worker_is_retried(tagged_model, start_workers):
+    experiments = create_experiments(4)
+    with LinnyRCoordinator(tagged_model, authkey=AUTHKEY) as coordinator:
+        workers = start_workers(coordinator, 2)
+
+        # kill the first worker while it is solving (each run takes more than a second)
+        killer = threading.Timer(1.5, workers[0].kill)
+        killer.start()
+        results = coordinator.run_experiments(experiments)
+        killer.join()
+
+        # its experiment has been solved again by the other worker
+        assert_results(results, experiments)
+        assert workers[0].exitcode == -signal.SIGKILL
+        assert len(coordinator._workers) == 1
+
+
+def test_task_timeout(tagged_model, start_workers, monkeypatch):
+    monkeypatch.setenv('LRC_FAKE_SOLVE_TIME', '3')
+    with LinnyRCoordinator(tagged_model, authkey=AUTHKEY, max_retries=0, task_timeout=0.5) as coordinator:
+        start_workers(coordinator, 1)
+
+        # the worker is given up on long before its run is done
+        start = time.monotonic()
+        results = coordinator.run_experiments(create_experiments(1), return_exceptions=True)
+        assert time.monotonic() - start < 3
+        assert isinstance(results[0], LinnyRWorkerError)
+        assert 'no result after 0.5 s' in str(results[0])
+        assert coordinator._workers == []
+
+        # without return_exceptions (and without workers) the error is raised
+        coordinator.connect_timeout = 0.5
+        with pytest.raises(LinnyRWorkerError):
+            coordinator.run_experiments(create_experiments(1))
+
+
+def test_stale_results_are_discarded(tagged_model, start_workers):
+    with LinnyRCoordinator(tagged_model, authkey=AUTHKEY) as coordinator:
+        start_workers(coordinator, 2)
+
+        # the invalid experiment fails at once, while the other worker is still solving
+        experiments = create_experiments(2)
+        experiments[0]['E day-ahead:Price'] = float('nan')
+        with pytest.raises(LinnyRWorkerError):
+            coordinator.run_experiments(experiments)
+
+        # the late result of that run is not taken for the result of an experiment of the next call
+        experiments = create_experiments(4)[2:]
+        assert_results(coordinator.run_experiments(experiments), experiments)
+
+
+def test_connect_timeout(tagged_model):
+    with LinnyRCoordinator(tagged_model, authkey=AUTHKEY, connect_timeout=0.5) as coordinator:
+        start = time.monotonic()
+        with pytest.raises(LinnyRWorkerError, match='no worker'):
+            coordinator.run_experiments(create_experiments(1))
+        assert time.monotonic() - start < 5
@@ -0,0 +1,100 @@
+'''
+Tests of the asyncio runner (linnyr_runner.AsyncLinnyRRunner): timeouts, cancellation and failed runs.
+
+'''
+
+# import required packages
+import asyncio, subprocess, time
+
+import pytest
+
+from conftest import PERIODS, create_experiments, scratch_directories #@UnresolvedImport
+from linnyr_runner import AsyncLinnyRRunner #@UnresolvedImport
+
+
+# define a function for checking that a run left no processes and no scratch directories behind
+def assert_cleaned_up(model, started):
+    assert started
+    assert all(process.poll() is not None for process in started)
+    assert scratch_directories(model) == []
+
+
+def test_results(fake_model, started):
+    results = AsyncLinnyRRunner(fake_model, max_concurrency=2).run_experiments(create_experiments(3))
+    assert [len(i['CF total']) for i in results] == [PERIODS] * 3
+    assert_cleaned_up(fake_model, started)
+
+
+def test_timeout_kills_processes(fake_model, started, monkeypatch):
+    monkeypatch.setenv('LRC_FAKE_SOLVE_TIME', '60')
+    runner = AsyncLinnyRRunner(fake_model, max_concurrency=2, timeout=0.5)
+
+    # the first timeout is raised and the other runs are cancelled
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        runner.run_experiments(create_experiments(3))
+    assert time.monotonic() - start < 30
+    assert_cleaned_up(fake_model, started)
+
+
+def test_timeout_with_return_exceptions(fake_model, started, monkeypatch):
+    monkeypatch.setenv('LRC_FAKE_SOLVE_TIME', '60')
+    runner = AsyncLinnyRRunner(fake_model, max_concurrency=2, timeout=0.5)
+
+    # every run gives its own timeout
+    results = runner.run_experiments(create_experiments(3), return_exceptions=True)
+    assert [type(i) for i in results] == [subprocess.TimeoutExpired] * 3
+    assert len(started) == 3
+    assert_cleaned_up(fake_model, started)
+
+
+def test_return_exceptions_keeps_other_results(fake_model, started):
+    experiments = create_experiments(3)
+    experiments[1]['E day-ahead:Price'] = float('nan')
+
+    # the invalid experiment fails on its own, the others are solved
+    results = AsyncLinnyRRunner(fake_model, max_concurrency=2).run_experiments(experiments, return_exceptions=True)
+    assert isinstance(results[1], ValueError)
+    assert [len(results[i]['CF total']) for i in (0, 2)] == [PERIODS] * 2
+    assert_cleaned_up(fake_model, started)
+
+
+def test_cancellation_kills_processes(fake_model, started, monkeypatch):
+    monkeypatch.setenv('LRC_FAKE_SOLVE_TIME', '60')
+    runner = AsyncLinnyRRunner(fake_model, max_concurrency=2)
+
+    # cancel the runs as soon as the solvers have been started
+    async def cancel():
+        task = asyncio.ensure_future(runner.run_experiments_async(create_experiments(3)))
+        while len(started) < 2:
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.monotonic()
+    asyncio.run(cancel())
+    assert time.monotonic() - start < 30
+    assert len(started) == 2
+    assert_cleaned_up(fake_model, started)
+
+
+def test_windows_count_against_max_concurrency(fake_model, started, monkeypatch):
+    monkeypatch.setenv('LRC_FAKE_SOLVE_TIME', '0.3')
+    fake_model.n_windows = 2
+    runner = AsyncLinnyRRunner(fake_model, max_concurrency=2)
+
+    # record the number of running processes whenever a window is started
+    running = []
+    run_lrc = runner._run_lrc
+
+    def counting_run_lrc(command, cwd, timeout):
+        running.append(sum(process.poll() is None for process in started))
+        return run_lrc(command, cwd, timeout)
+
+    runner._run_lrc = counting_run_lrc
+    results = runner.run_experiments(create_experiments(3))
+    assert [len(i['CF total']) for i in results] == [PERIODS] * 3
+    assert len(started) == 6
+    assert max(running) <= 2
+    assert_cleaned_up(fake_model, started)